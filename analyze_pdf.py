@@ -3,73 +3,393 @@
 Анализ PDF файла для понимания его структуры
 """
 
-import pdfplumber
+import io
 import os
+import sys
+import pickle
+import hashlib
+import itertools
+import functools
+import concurrent.futures
+import numpy as np
 
-def analyze_pdf(pdf_file):
-    """Анализирует PDF файл и показывает его структуру"""
+# pdfplumber-rs повторяет API pdfplumber, но реализован на Rust и
+# заметно быстрее извлекает текст и таблицы; если нативное колесо
+# не установлено, используем обычный pdfplumber
+try:
+    import pdfplumber_rs as pdfplumber
+except ImportError:
+    import pdfplumber
+
+# PyMuPDF (обёртка над MuPDF на C) извлекает текст, таблицы и графику
+# на порядок быстрее pdfminer; если он установлен, страницы анализируются им
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+# pypdfium2 читает количество страниц из дерева страниц без разбора
+# документа через pdfminer
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+# Библиотека, которой анализируются страницы; входит в ключ кэша,
+# так как разные библиотеки по-разному считают графические объекты
+PDF_BACKEND = 'pymupdf' if fitz is not None else pdfplumber.__name__
+
+# Сколько ячеек первой строки таблицы показывать в отчёте
+FIRST_ROW_PREVIEW_CELLS = 6
+
+# Сигнатура PDF; по спецификации может встречаться в первых 1024 байтах файла
+PDF_MAGIC = b'%PDF-'
+PDF_MAGIC_SEARCH_LENGTH = 1024
+
+# Шаблоны вывода результатов по странице
+PAGE_TEXT_TEMPLATE = "\n📄 Страница {}:\n📝 Текст (первые 200 символов): {}...\n"
+PAGE_NO_TEXT_TEMPLATE = "\n📄 Страница {}:\n📝 Текст не найден\n"
+TABLES_COUNT_TEMPLATE = "📋 Найдено таблиц: {}\n"
+TABLE_SHAPE_TEMPLATE = "   Таблица {}: {} строк x {} столбцов\n"
+FIRST_ROW_TEMPLATE = "   Первая строка: {}\n"
+NO_TABLES_LINE = "   Таблицы не найдены\n"
+PAGE_OBJECTS_TEMPLATE = (
+    "🖼️ Найдено изображений: {n_images}\n"
+    "📏 Найдено линий: {n_lines}\n"
+    "⬜ Найдено прямоугольников: {n_rects}\n"
+)
+
+# Каталог для сохранения результатов разбора между запусками скрипта
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'analyze_pdf')
+
+# Длина превью текста страницы и высота верхней полосы страницы (в пунктах),
+# из которой оно сначала извлекается
+TEXT_PREVIEW_LENGTH = 200
+TEXT_PREVIEW_BAND_HEIGHT = 150
+
+def _extract_text_preview(page, limit=TEXT_PREVIEW_LENGTH):
+    """
+    Возвращает начало текста страницы
     
-    if not os.path.exists(pdf_file):
-        print(f"❌ Файл {pdf_file} не найден!")
-        return False
+    Сначала извлекает текст только из верхней полосы страницы, чтобы
+    не строить раскладку всей страницы ради первых символов. Если
+    в полосе текста меньше limit символов, извлекает текст целиком.
+    """
+    x0, top, x1, bottom = page.bbox
+    band = (x0, top, x1, min(bottom, top + TEXT_PREVIEW_BAND_HEIGHT))
+    
+    text = page.crop(band).extract_text()
+    if (not text or len(text) < limit) and band[3] < bottom:
+        text = page.extract_text()
+    
+    return text[:limit] if text else None
+
+# Страницы PDF, открытого в текущем процессе-обработчике. Все страницы
+# принадлежат одному объекту PDF, поэтому его PDFResourceManager переиспользует
+# разобранные шрифты и cmap между страницами, а не загружает их заново
+_worker_pages = {}
+
+def _init_worker(pdf_file, page_numbers):
+    """Открывает PDF один раз на процесс-обработчик"""
+    # Файл закрывается вместе с завершением процесса
+    if fitz is not None:
+        document = fitz.open(pdf_file)
+        _worker_pages.update((page_num, document[page_num]) for page_num in page_numbers)
+    else:
+        pdf = pdfplumber.open(pdf_file, pages=[page_num + 1 for page_num in page_numbers])
+        _worker_pages.update((page.page_number - 1, page) for page in pdf.pages)
+
+def _preview_row(row, limit=FIRST_ROW_PREVIEW_CELLS):
+    """Возвращает первые ячейки строки таблицы для вывода"""
+    preview = list(itertools.islice(row, limit))
+    if len(row) > limit:
+        preview.append('...')
+    return preview
+
+def _build_page_result(text_preview, tables, n_images, n_lines, n_rects, image_only=False):
+    """Формирует результат анализа страницы"""
+    return {
+        'image_only': image_only,
+        'text_preview': text_preview,
+        'n_tables': len(tables),
+        'table_shapes': [(len(table), len(table[0]) if table else 0) for table in tables],
+        'first_rows': [_preview_row(table[0]) if table else None for table in tables],
+        'n_images': n_images,
+        'n_lines': n_lines,
+        'n_rects': n_rects
+    }
+
+def _analyze_pdfplumber_page(page):
+    """Анализирует страницу с помощью pdfplumber"""
+    # page.lines, page.rects и page.images фильтруют один и тот же словарь
+    # page.objects, поэтому получаем его один раз
+    objects = page.objects
+    n_lines = len(objects.get('line', ()))
+    n_rects = len(objects.get('rect', ()))
+    n_images = len(objects.get('image', ()))
+    
+    # Страница-изображение (скриншот, скан) не содержит символов,
+    # поэтому извлекать из неё текст и таблицы бессмысленно
+    if n_images and not objects.get('char'):
+        return _build_page_result(None, [], n_images, n_lines, n_rects, image_only=True)
+    
+    # Извлекаем начало текста
+    text_preview = _extract_text_preview(page)
+    
+    # Без линий и прямоугольников таблицу найти нельзя (например, у скриншотов),
+    # поэтому пропускаем дорогой extract_tables
+    if n_lines == 0 and n_rects == 0:
+        tables = []
+    else:
+        tables = page.extract_tables()
+    
+    return _build_page_result(text_preview, tables, n_images, n_lines, n_rects)
+
+def _analyze_fitz_page(page):
+    """Анализирует страницу с помощью PyMuPDF"""
+    text = page.get_text("text").strip()
+    text_preview = text[:TEXT_PREVIEW_LENGTH] if text else None
+    n_images = len(page.get_images(full=False))
+    
+    # Страница-изображение (скриншот, скан) не содержит текста
+    image_only = bool(n_images) and not text_preview
+    
+    # Векторная графика: 'l' - отрезки, 're' - прямоугольники
+    n_lines = 0
+    n_rects = 0
+    for drawing in page.get_drawings():
+        for item in drawing['items']:
+            if item[0] == 'l':
+                n_lines += 1
+            elif item[0] == 're':
+                n_rects += 1
+    
+    # Как и для pdfplumber, на страницах-изображениях и без линий
+    # и прямоугольников таблицы не ищем
+    if image_only or (n_lines == 0 and n_rects == 0):
+        tables = []
+    else:
+        tables = [table.extract() for table in page.find_tables().tables]
+    
+    return _build_page_result(text_preview, tables, n_images, n_lines, n_rects, image_only)
+
+def _analyze_page(page_num):
+    """Анализирует одну страницу PDF (выполняется в отдельном процессе)"""
+    # Каждая страница анализируется один раз, поэтому сразу забираем её из словаря
+    page = _worker_pages.pop(page_num)
+    
+    if fitz is not None:
+        return _analyze_fitz_page(page)
     
     try:
-        print(f"📄 Анализируем PDF файл: {pdf_file}")
-        print("=" * 50)
+        return _analyze_pdfplumber_page(page)
+    finally:
+        # pdfplumber хранит разобранные объекты страницы до закрытия PDF;
+        # освобождаем их, чтобы память не росла с числом страниц
+        page.flush_cache()
+
+def _write_page_result(out, page_num, result):
+    """Записывает результаты анализа одной страницы в буфер вывода"""
+    if result['text_preview']:
+        out.write(PAGE_TEXT_TEMPLATE.format(page_num + 1, result['text_preview']))
+    else:
+        out.write(PAGE_NO_TEXT_TEMPLATE.format(page_num + 1))
+    
+    out.write(TABLES_COUNT_TEMPLATE.format(result['n_tables']))
+    
+    if result['n_tables']:
+        for i, (rows, cols) in enumerate(result['table_shapes'], 1):
+            out.write(TABLE_SHAPE_TEMPLATE.format(i, rows, cols))
+            if result['first_rows'][i - 1]:
+                out.write(FIRST_ROW_TEMPLATE.format(result['first_rows'][i - 1]))
+    else:
+        out.write(NO_TABLES_LINE)
+    
+    out.write(PAGE_OBJECTS_TEMPLATE.format_map(result))
+
+def _summarize_pages(pages):
+    """Считает итоговую статистику по результатам анализа страниц"""
+    counts = np.array(
+        [[page['n_tables'], page['n_images'], page['n_lines'], page['n_rects']] for page in pages],
+        dtype=np.int64
+    ).reshape(-1, 4)
+    table_columns = np.array(
+        [cols for page in pages for _, cols in page['table_shapes']],
+        dtype=np.int64
+    )
+    
+    totals = counts.sum(axis=0)
+    return {
+        'total_tables': int(totals[0]),
+        'total_images': int(totals[1]),
+        'total_lines': int(totals[2]),
+        'total_rects': int(totals[3]),
+        'pages_with_tables': int(np.count_nonzero(counts[:, 0])),
+        'max_table_columns': int(table_columns.max()) if table_columns.size else 0
+    }
+
+def _sample_page_numbers(n_pages, sample=None):
+    """Возвращает номера страниц (с нуля), равномерно выбранные по документу"""
+    if not sample or sample >= n_pages:
+        return list(range(n_pages))
+    if sample == 1:
+        return [0]
+    
+    step = (n_pages - 1) / (sample - 1)
+    return sorted({round(i * step) for i in range(sample)})
+
+def _is_pdf_file(pdf_file):
+    """Проверяет по сигнатуре, что файл действительно является PDF"""
+    with open(pdf_file, 'rb') as f:
+        return PDF_MAGIC in f.read(PDF_MAGIC_SEARCH_LENGTH)
+
+def _count_pages(pdf_file):
+    """Возвращает количество страниц в PDF"""
+    if pdfium is not None:
+        document = pdfium.PdfDocument(pdf_file)
+        try:
+            return len(document)
+        finally:
+            document.close()
+    
+    if fitz is not None:
+        with fitz.open(pdf_file) as document:
+            return document.page_count
+    
+    with pdfplumber.open(pdf_file) as pdf:
+        return len(pdf.pages)
+
+def _collect_pdf_info(pdf_file, sample=None):
+    """Разбирает PDF и возвращает данные о его структуре"""
+    n_pages = _count_pages(pdf_file)
+    
+    if n_pages == 0:
+        return {'n_pages': 0, 'page_numbers': [], 'pages': []}
+    
+    page_numbers = _sample_page_numbers(n_pages, sample)
+    
+    # Страницы анализируются независимо, поэтому распределяем их по процессам
+    max_workers = min(os.cpu_count() or 1, len(page_numbers))
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(pdf_file, page_numbers)
+    ) as executor:
+        pages = list(executor.map(_analyze_page, page_numbers, chunksize=4))
+    
+    return {'n_pages': n_pages, 'page_numbers': page_numbers, 'pages': pages}
+
+@functools.lru_cache(maxsize=32)
+def _cached_analyze(path, mtime_ns, size, sample=None):
+    """
+    Возвращает результат разбора PDF с кэшированием в памяти и на диске
+    
+    Ключ кэша включает время изменения и размер файла, поэтому
+    изменённый файл разбирается заново.
+    """
+    key = hashlib.blake2b(f"{PDF_BACKEND}:{path}:{mtime_ns}:{size}:{sample}".encode()).hexdigest()
+    cache_path = os.path.join(CACHE_DIR, f"{key}.pkl")
+    
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        pass
+    
+    info = _collect_pdf_info(path, sample)
+    
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(info, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Кэш на диске необязателен, результат всё равно возвращаем
+        pass
+    
+    return info
+
+def _write_report(report):
+    """Выводит готовый отчёт в stdout одной записью"""
+    stream = getattr(sys.stdout, 'buffer', None)
+    if stream is None:
+        # stdout подменён текстовым объектом без байтового буфера
+        sys.stdout.write(report)
+        return
+    
+    # Кодируем весь отчёт в UTF-8 за один вызов; заодно эмодзи выводятся
+    # и там, где кодировка консоли не UTF-8
+    sys.stdout.flush()
+    stream.write(report.encode('utf-8'))
+    stream.flush()
+
+def analyze_pdf(pdf_file, sample=None):
+    """
+    Анализирует PDF файл и показывает его структуру
+    
+    Args:
+        pdf_file: Путь к PDF файлу
+        sample: Количество равномерно выбранных страниц для быстрого
+            просмотра; по умолчанию анализируются все страницы
+    """
+    
+    # Собираем весь отчёт в буфер и выводим его одной записью в конце
+    out = io.StringIO()
+    
+    try:
+        if not os.path.exists(pdf_file):
+            out.write(f"❌ Файл {pdf_file} не найден!\n")
+            return False
+        
+        if not _is_pdf_file(pdf_file):
+            out.write(f"❌ Файл {pdf_file} не является PDF!\n")
+            out.write("   Попробуйте использовать CSV или Excel файлы для лучших результатов\n")
+            return False
         
-        with pdfplumber.open(pdf_file) as pdf:
-            print(f"📊 Количество страниц: {len(pdf.pages)}")
-            
-            if len(pdf.pages) == 0:
-                print("❌ PDF файл не содержит страниц")
-                return False
-            
-            # Анализируем каждую страницу
-            for page_num, page in enumerate(pdf.pages):
-                print(f"\n📄 Страница {page_num + 1}:")
-                
-                # Извлекаем текст
-                text = page.extract_text()
-                if text:
-                    print(f"📝 Текст (первые 200 символов): {text[:200]}...")
-                else:
-                    print("📝 Текст не найден")
-                
-                # Ищем таблицы
-                tables = page.extract_tables()
-                print(f"📋 Найдено таблиц: {len(tables)}")
-                
-                if tables:
-                    for i, table in enumerate(tables):
-                        print(f"   Таблица {i+1}: {len(table)} строк x {len(table[0]) if table else 0} столбцов")
-                        if table and len(table) > 0:
-                            print(f"   Первая строка: {table[0]}")
-                else:
-                    print("   Таблицы не найдены")
-                
-                # Ищем изображения
-                images = page.images
-                print(f"🖼️ Найдено изображений: {len(images)}")
-                
-                # Ищем линии
-                lines = page.lines
-                print(f"📏 Найдено линий: {len(lines)}")
-                
-                # Ищем прямоугольники
-                rects = page.rects
-                print(f"⬜ Найдено прямоугольников: {len(rects)}")
+        out.write(f"📄 Анализируем PDF файл: {pdf_file}\n")
+        out.write("=" * 50 + "\n")
         
-        print("\n" + "=" * 50)
-        print("💡 Рекомендации:")
-        print("   - Если это скриншот или изображение, таблицы не будут найдены")
-        print("   - Для анализа таблиц нужен PDF с текстовыми таблицами")
-        print("   - Попробуйте использовать CSV или Excel файлы для лучших результатов")
+        path = os.path.abspath(pdf_file)
+        stat = os.stat(path)
+        info = _cached_analyze(path, stat.st_mtime_ns, stat.st_size, sample)
+        
+        out.write(f"📊 Количество страниц: {info['n_pages']}\n")
+        
+        if info['n_pages'] == 0:
+            out.write("❌ PDF файл не содержит страниц\n")
+            return False
+        
+        if len(info['page_numbers']) < info['n_pages']:
+            out.write(f"🔎 Проанализировано страниц: {len(info['page_numbers'])} из {info['n_pages']}\n")
+        
+        for page_num, result in zip(info['page_numbers'], info['pages']):
+            _write_page_result(out, page_num, result)
+        
+        summary = _summarize_pages(info['pages'])
+        out.write("\n📈 Итого по проанализированным страницам:\n")
+        out.write(f"   Таблиц: {summary['total_tables']} (на {summary['pages_with_tables']} стр.), "
+                  f"максимум столбцов: {summary['max_table_columns']}\n")
+        out.write(f"   Изображений: {summary['total_images']}, линий: {summary['total_lines']}, "
+                  f"прямоугольников: {summary['total_rects']}\n")
+        
+        if all(result.get('image_only') for result in info['pages']):
+            out.write("\n🖼️ PDF состоит только из изображений: текст и таблицы не извлекались\n")
+        
+        out.write("\n" + "=" * 50 + "\n")
+        out.write("💡 Рекомендации:\n")
+        out.write("   - Если это скриншот или изображение, таблицы не будут найдены\n")
+        out.write("   - Для анализа таблиц нужен PDF с текстовыми таблицами\n")
+        out.write("   - Попробуйте использовать CSV или Excel файлы для лучших результатов\n")
         
         return True
         
     except Exception as e:
-        print(f"❌ Ошибка анализа PDF: {e}")
+        out.write(f"❌ Ошибка анализа PDF: {e}\n")
         return False
+    
+    finally:
+        _write_report(out.getvalue())
 
 if __name__ == "__main__":
     pdf_file = "Screenshot 2025-09-18 214023.pdf"
@@ -5,22 +5,49 @@
 """
 
 import os
+import codecs
+import functools
+import hashlib
+import shelve
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 import pandas as pd
 import plotly.graph_objs as go
-import plotly.utils
-import json
 import logging
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, current_app, render_template, request, jsonify, send_file
+from flask.json.provider import DefaultJSONProvider
 from werkzeug.utils import secure_filename
 import tempfile
 import io
 from datetime import datetime
 import numpy as np
-import pdfplumber
+from pandas.api.types import (
+    is_bool_dtype, is_datetime64_any_dtype, is_integer_dtype, is_numeric_dtype,
+    is_object_dtype, is_string_dtype
+)
+import pyarrow as pa
+import pyarrow.parquet as pq
+try:
+    # Быстрая сериализация ответов в JSON, если orjson установлен
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    # Определение кодировки CSV, если она не из CSV_PROBE_ENCODINGS
+    from charset_normalizer import from_bytes as detect_encoding
+except ImportError:
+    detect_encoding = None
 from dotenv import load_dotenv
 from yandex_gpt_module import create_yandex_analyzer
 from gigachat_module import create_gigachat_analyzer
 from pdf_generator import create_pdf_report
+from pdf_tables import (
+    TYPE_DETECTION_THRESHOLD, clean_dataframe, extract_table_from_pdf, to_datetime_mixed
+)
 
 # Загружаем переменные окружения из .env файла
 load_dotenv()
@@ -31,9 +58,78 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+# Подробный журнал запросов (logger.debug) выводится только при локальной
+# разработке, в продакшене на Render эти вызовы ничего не делают
+if not os.environ.get('RENDER'):
+    logger.setLevel(logging.DEBUG)
+
+# Параметры orjson: типы numpy сериализуются без вызова default
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+class AnalyticsJSONProvider(DefaultJSONProvider):
+    """
+    JSON провайдер Flask с поддержкой типов numpy и pandas
+    
+    Если установлен orjson, ответы сериализуются им, иначе стандартным json.
+    """
+    
+    def _dumps_bytes(self, obj, **kwargs):
+        option = ORJSON_OPTIONS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+    
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        return self._dumps_bytes(obj, **kwargs).decode('utf-8')
+    
+    def response(self, *args, **kwargs):
+        # Тело ответа отдаём байтами orjson, без декодирования в str
+        # и повторного кодирования: ответы с анализами занимают десятки КБ
+        # Только публичный API Flask: аргументы разбираются так же, как
+        # в DefaultJSONProvider.response, и форматирование зависит от
+        # compact и режима отладки приложения
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        
+        if args and kwargs:
+            raise TypeError("app.json.response() takes either args or kwargs, not both")
+        if len(args) == 1:
+            obj = args[0]
+        else:
+            obj = args or kwargs or None
+        indent = self.compact is False or (self.compact is None and current_app.debug)
+        return current_app.response_class(
+            self._dumps_bytes(obj, indent=indent) + b'\n', mimetype=self.mimetype
+        )
+    
+    def loads(self, s, **kwargs):
+        if orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+    
+    @staticmethod
+    def default(o):
+        if o is pd.NaT:
+            return None
+        if isinstance(o, np.integer):
+            return int(o)
+        if isinstance(o, np.floating):
+            return None if np.isnan(o) else float(o)
+        if isinstance(o, np.bool_):
+            return bool(o)
+        if isinstance(o, np.ndarray):  # массивы в данных диаграмм plotly
+            return o.tolist()
+        if isinstance(o, datetime):  # в том числе pandas Timestamp
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
 
 # Создание Flask приложения
 app = Flask(__name__)
+app.json = AnalyticsJSONProvider(app)
 app.config['MAX_CONTENT_LENGTH'] = 200 * 1024 * 1024  # 200MB max file size
 app.config['MAX_CONTENT_PATH'] = 200 * 1024 * 1024  # 200MB max content path
 
@@ -45,104 +141,223 @@ app.config['MAX_CONTENT_PATH'] = 200 * 1024 * 1024  # 200MB max content path
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv', 'pdf'}
 
+# Файлы больше этого размера (кроме PDF) читаются не целиком,
+# а только первые LARGE_FILE_ROWS строк
+LARGE_FILE_SIZE = 10 * 1024 * 1024
+LARGE_FILE_ROWS = 10000
+
+# Кодировки CSV, которые по очереди проверяются на начале файла,
+# размер проверяемого начала и кодировка, которая декодирует любой файл
+CSV_PROBE_ENCODINGS = ('utf-8', 'cp1251')
+CSV_PROBE_SIZE = 64 * 1024
+CSV_FALLBACK_ENCODING = 'latin-1'
+
+# Размер блока при сохранении и хэшировании загружаемого файла:
+# крупные блоки уменьшают число системных вызовов read/write
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Размер выборки, по которой текстовый столбец проверяется на числа и даты
+TYPE_DETECTION_SAMPLE_SIZE = 100
+
+# Максимальное количество уникальных значений, при котором для текстового
+# столбца ещё считаются самые частые значения
+TOP_VALUES_MAX_UNIQUE = 10000
+
+# Текстовые столбцы с долей уникальных значений ниже порога храним как category
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+# Число первых строк файла, которые отправляются нейросетям на анализ
+LLM_SAMPLE_ROWS = 15
+
+# Фоновые задачи анализа нейросетями: число потоков и время хранения
+# результата (в секундах) после завершения задачи
+ANALYSIS_WORKERS = 32
+ANALYSIS_JOB_TTL = 60 * 60
+
+# Число потоков для параллельного расчёта аналитики при загрузке файла
+ANALYTICS_WORKERS = 4
+
+# Число процессов для разбора PDF: разбор нагружает процессор и держит GIL,
+# поэтому одновременно загруженные PDF файлы разбираются в разных процессах
+PDF_WORKERS = min(os.cpu_count() or 1, 4)
+
+# Суффикс файла с очищенными данными в формате Parquet
+PARQUET_SUFFIX = '.parquet'
+
+# Число строк в группе Parquet файла: load_more читает только нужные группы
+PARQUET_ROW_GROUP_SIZE = 1000
+
+# Файл с результатами анализов нейросетями: повторный анализ тех же
+# строк тем же анализатором берётся из него без запроса к API
+ANALYSIS_CACHE_PATH = os.path.join(UPLOAD_FOLDER, 'analysis_cache')
+
+# Число строк таблицы в PDF отчёте
+PDF_TABLE_ROWS = 50
+
+# Поля ответа /upload, которые страница возвращает в /generate_pdf,
+# чтобы отчёт строился без повторного чтения файла
+PDF_REPORT_FIELDS = ('columns', 'total_rows', 'analytics', 'table_data')
+
+# Фоновые задачи анализа: id задачи -> (время создания, Future)
+# и уже сгенерированный текст задач, которые читают ответ потоком
+_analysis_executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS)
+_analysis_jobs = {}
+_analysis_progress = {}
+_analysis_jobs_lock = threading.Lock()
+_analysis_cache_lock = threading.Lock()
+
+# Пул процессов для разбора PDF, создаётся при первом PDF файле
+_pdf_executor = None
+_pdf_executor_lock = threading.Lock()
+
 # Создаем папку для загрузок
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# За nginx/Apache файлы отдаёт веб-сервер по заголовку X-Sendfile
+app.config['USE_X_SENDFILE'] = bool(os.environ.get('USE_X_SENDFILE'))
+
+# Соединение с Яндекс.GPT можно установить при старте, а не на первом анализе.
+# Только в обслуживающем процессе: при python app.py дочерние процессы
+# разбора PDF заново импортируют этот модуль, но к API не обращаются
+if os.environ.get('YANDEX_GPT_PREWARM') and multiprocessing.parent_process() is None:
+    create_yandex_analyzer(prewarm=True)
+
+def file_extension(filename):
+    """Возвращает расширение файла в нижнем регистре без точки"""
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
 
 def allowed_file(filename):
     """Проверяет, разрешен ли тип файла"""
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return file_extension(filename) in ALLOWED_EXTENSIONS
+
+def _convert_datetime_column(series):
+    """Приводит даты к строкам"""
+    return series.astype('str')
+
+def _convert_numeric_column(series):
+    """Приводит числа и bool к Python типам"""
+    return series.astype(object)
+
+def _convert_object_column(series):
+    """Приводит object столбец к числам, если он числовой, иначе к строкам"""
+    sample_values = series.dropna().head(5)
+    if len(sample_values) > 0:
+        # Пробуем преобразовать в числа
+        try:
+            pd.to_numeric(sample_values.iloc[0])
+            return pd.to_numeric(series, errors='coerce').astype('float').astype(object)
+        except (ValueError, TypeError):
+            # Если не число, оставляем как строку
+            pass
+    return series.astype('str')
+
+# Функции преобразования столбцов по dtype.kind; остальные типы
+# обрабатываются как object
+COLUMN_CONVERTERS = {
+    'M': _convert_datetime_column,
+    'b': _convert_numeric_column,
+    'i': _convert_numeric_column,
+    'u': _convert_numeric_column,
+    'f': _convert_numeric_column,
+    'c': _convert_numeric_column,
+}
 
 def convert_dataframe_to_json_safe(df):
     """Преобразует DataFrame в JSON-безопасный формат"""
-    df_clean = df.copy()
-    
-    for column in df_clean.columns:
+    # Преобразуем столбцы целиком, а результат собираем из новых столбцов,
+    # не копируя исходный DataFrame
+    converted_columns = {}
+    for position, column in enumerate(df.columns):
+        series = df.iloc[:, position]
         try:
-            # Преобразуем numpy типы в Python типы
-            if df_clean[column].dtype == 'int64':
-                df_clean[column] = df_clean[column].astype('int')
-            elif df_clean[column].dtype == 'float64':
-                df_clean[column] = df_clean[column].astype('float')
-            elif df_clean[column].dtype == 'bool':
-                df_clean[column] = df_clean[column].astype('bool')
-            elif 'datetime' in str(df_clean[column].dtype):
-                df_clean[column] = df_clean[column].astype('str')
-            elif df_clean[column].dtype == 'object':
-                # Для object типов проверяем содержимое
-                sample_values = df_clean[column].dropna().head(5)
-                if len(sample_values) > 0:
-                    # Пробуем преобразовать в числа
-                    try:
-                        pd.to_numeric(sample_values.iloc[0])
-                        df_clean[column] = pd.to_numeric(df_clean[column], errors='coerce').astype('float')
-                    except:
-                        # Если не число, оставляем как строку
-                        df_clean[column] = df_clean[column].astype('str')
-                else:
-                    df_clean[column] = df_clean[column].astype('str')
+            if _is_category(series):
+                # Значения category обрабатываем так же, как исходные object
+                series = series.astype(object)
+            
+            # Тип определяем один раз по dtype.kind, а не по значениям
+            converter = COLUMN_CONVERTERS.get(series.dtype.kind, _convert_object_column)
+            converted = converter(series)
+            
+            # Заменяем NaN/NaT на None; столбец без пропусков не перестраиваем
+            present = series.notna() & converted.notna()
+            if not present.all():
+                converted = converted.where(present, None)
+            converted_columns[position] = converted
         except Exception as e:
             logger.warning(f"Ошибка преобразования столбца {column}: {e}")
             # В случае ошибки преобразуем в строки
             try:
-                df_clean[column] = df_clean[column].astype('str')
-            except:
+                converted_columns[position] = series.astype('str')
+            except Exception:
                 # Если и это не работает, заменяем на пустые строки
-                df_clean[column] = ''
+                converted_columns[position] = pd.Series('', index=df.index)
     
-    # Заменяем NaN на None
-    df_clean = df_clean.where(pd.notnull(df_clean), None)
+    df_clean = pd.DataFrame(converted_columns, index=df.index, copy=False)
+    df_clean.columns = df.columns
+    return df_clean
+
+def dataframe_to_records(df):
+    """
+    Преобразует DataFrame в список JSON-безопасных записей
     
-    # Дополнительная проверка - заменяем все numpy типы и Timestamp на Python типы
-    for column in df_clean.columns:
-        try:
-            # Используем .loc для избежания chained assignment
-            for i in range(len(df_clean[column])):
-                value = df_clean[column].iloc[i]
-                if hasattr(value, 'item'):  # numpy scalar
-                    df_clean.loc[df_clean.index[i], column] = value.item()
-                elif isinstance(value, (np.integer, np.floating)):
-                    df_clean.loc[df_clean.index[i], column] = value.item()
-                elif hasattr(value, 'strftime'):  # Timestamp или datetime объект
-                    df_clean.loc[df_clean.index[i], column] = str(value)
-                elif isinstance(value, pd.Timestamp):  # pandas Timestamp
-                    df_clean.loc[df_clean.index[i], column] = str(value)
-        except Exception as e:
-            logger.warning(f"Ошибка преобразования элементов столбца {column}: {e}")
+    Записи строит pyarrow за один проход: пропуски становятся None,
+    числа и строки - значениями Python. Даты заранее приводятся к строкам,
+    как в convert_dataframe_to_json_safe. Столбцы со смешанными типами
+    значений pyarrow не поддерживает, для них используется
+    convert_dataframe_to_json_safe.
+    """
+    datetime_columns = [col for col in df.columns if is_datetime64_any_dtype(df[col])]
+    if datetime_columns:
+        df = df.copy(deep=False)
+        for column in datetime_columns:
+            # NaT заменяем на None, только если он есть в столбце
+            dates = df[column]
+            present = dates.notna()
+            dates = dates.astype('str')
+            df[column] = dates if present.all() else dates.where(present, None)
     
-    return df_clean
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False).to_pylist()
+    except (pa.ArrowException, ValueError) as e:
+        logger.debug(f"pyarrow не смог преобразовать DataFrame: {e}")
+        return convert_dataframe_to_json_safe(df).to_dict(orient='records')
+
+def _parsed_share(parser, values):
+    """Возвращает долю значений, которые удалось разобрать функцией parser"""
+    try:
+        return parser(values, errors='coerce').notna().mean()
+    except (TypeError, ValueError):
+        return 0.0
+
+def _is_category(series):
+    """Проверяет, хранится ли столбец в типе category"""
+    return isinstance(series.dtype, pd.CategoricalDtype)
 
 def detect_data_types(df):
     """Автоматически определяет типы данных в DataFrame"""
     data_types = {}
     
     for column in df.columns:
-        # Пробуем определить тип данных
-        if df[column].dtype in ['int64', 'float64']:
+        series = df[column]
+        
+        if is_bool_dtype(series):
+            data_types[column] = 'text'
+        elif is_numeric_dtype(series):
             data_types[column] = 'numeric'
-        elif df[column].dtype == 'object':
-            # Проверяем, является ли это датой
-            try:
-                # Берем несколько значений для проверки
-                sample_values = df[column].dropna().head(3)
-                if len(sample_values) > 0:
-                    # Пробуем преобразовать в дату
-                    pd.to_datetime(sample_values.iloc[0])
-                    data_types[column] = 'datetime'
-                else:
-                    data_types[column] = 'text'
-            except:
-                # Проверяем, можно ли преобразовать в число
-                try:
-                    sample_values = df[column].dropna().head(3)
-                    if len(sample_values) > 0:
-                        pd.to_numeric(sample_values.iloc[0])
-                        data_types[column] = 'numeric'
-                    else:
-                        data_types[column] = 'text'
-                except:
-                    data_types[column] = 'text'
+        elif is_datetime64_any_dtype(series):
+            # pyarrow сразу распознаёт даты и время в формате ISO 8601
+            data_types[column] = 'datetime'
+        elif is_object_dtype(series) or is_string_dtype(series) or _is_category(series):
+            # Проверяем значения выборки целиком, а не одно первое значение
+            sample_values = series.dropna().head(TYPE_DETECTION_SAMPLE_SIZE).astype(object)
+            if len(sample_values) == 0:
+                data_types[column] = 'text'
+            elif _parsed_share(pd.to_numeric, sample_values) >= TYPE_DETECTION_THRESHOLD:
+                data_types[column] = 'numeric'
+            elif _parsed_share(to_datetime_mixed, sample_values) >= TYPE_DETECTION_THRESHOLD:
+                data_types[column] = 'datetime'
+            else:
+                data_types[column] = 'text'
         else:
             data_types[column] = 'text'
     
@@ -158,35 +373,50 @@ def get_basic_analytics(df):
     }
     
     # Общая статистика
-    numeric_columns = [col for col in df.columns if df[col].dtype in ['int64', 'float64']]
-    text_columns = [col for col in df.columns if df[col].dtype == 'object']
+    numeric_columns = [col for col in df.columns if is_numeric_dtype(df[col]) and not is_bool_dtype(df[col])]
+    text_columns = [col for col in df.columns if df[col].dtype == 'object' or _is_category(df[col])]
+    
+    # Статистику считаем один раз для всего DataFrame, а не отдельно по столбцам
+    non_null_counts = df.count()
+    null_counts = len(df) - non_null_counts
+    total_missing = int(null_counts.sum())
     
     analytics['summary_stats'] = {
         'numeric_columns': len(numeric_columns),
         'text_columns': len(text_columns),
-        'total_missing_values': int(df.isnull().sum().sum()),
-        'completeness_percentage': round((1 - df.isnull().sum().sum() / (len(df) * len(df.columns))) * 100, 2)
+        'total_missing_values': total_missing,
+        'completeness_percentage': round((1 - total_missing / df.size) * 100, 2) if df.size else 0.0
     }
     
+    unique_counts = df.nunique()
+    numeric_stats = pd.DataFrame()
+    if numeric_columns:
+        try:
+            numeric_stats = df[numeric_columns].agg(['sum', 'mean', 'min', 'max', 'median', 'std'])
+        except Exception as e:
+            logger.warning(f"Ошибка вычисления статистики числовых столбцов: {e}")
+    
     for column in df.columns:
         col_info = {
             'dtype': str(df[column].dtype),
-            'non_null_count': int(df[column].count()),
-            'null_count': int(df[column].isnull().sum()),
-            'unique_count': int(df[column].nunique()),
-            'completeness': round((df[column].count() / len(df)) * 100, 2)
+            'non_null_count': int(non_null_counts[column]),
+            'null_count': int(null_counts[column]),
+            'unique_count': int(unique_counts[column]),
+            'completeness': round((non_null_counts[column] / len(df)) * 100, 2)
         }
         
         # Для числовых столбцов добавляем статистику
-        if df[column].dtype in ['int64', 'float64']:
+        if column in numeric_columns:
             try:
+                # Для пустых столбцов (и std по одному значению) pandas возвращает NaN
+                stats = numeric_stats[column].fillna(0.0)
                 col_info.update({
-                    'sum': float(df[column].sum()) if not df[column].isnull().all() else 0.0,
-                    'mean': float(df[column].mean()) if not df[column].isnull().all() else 0.0,
-                    'min': float(df[column].min()) if not df[column].isnull().all() else 0.0,
-                    'max': float(df[column].max()) if not df[column].isnull().all() else 0.0,
-                    'median': float(df[column].median()) if not df[column].isnull().all() else 0.0,
-                    'std': float(df[column].std()) if not df[column].isnull().all() else 0.0
+                    'sum': float(stats['sum']),
+                    'mean': float(stats['mean']),
+                    'min': float(stats['min']),
+                    'max': float(stats['max']),
+                    'median': float(stats['median']),
+                    'std': float(stats['std'])
                 })
             except Exception as e:
                 logger.warning(f"Ошибка вычисления статистики для столбца {column}: {e}")
@@ -200,14 +430,19 @@ def get_basic_analytics(df):
                 })
         
         # Для текстовых столбцов добавляем информацию о самых частых значениях
-        elif df[column].dtype == 'object':
+        elif column in text_columns:
             try:
-                top_values = df[column].value_counts().head(5)
-                col_info['top_values'] = {
-                    str(k): int(v) for k, v in top_values.items()
-                }
+                # Для почти уникальных столбцов (идентификаторы и т.п.)
+                # частые значения не несут смысла, а value_counts дорогой
+                if unique_counts[column] > TOP_VALUES_MAX_UNIQUE:
+                    col_info['top_values'] = {}
+                else:
+                    top_values = df[column].value_counts().head(5)
+                    col_info['top_values'] = {
+                        str(k): int(v) for k, v in top_values.items()
+                    }
                 # Добавляем информацию о количестве уникальных значений
-                col_info['unique_values_count'] = int(df[column].nunique())
+                col_info['unique_values_count'] = int(unique_counts[column])
             except Exception as e:
                 logger.warning(f"Ошибка анализа текстового столбца {column}: {e}")
                 col_info['top_values'] = {}
@@ -229,8 +464,8 @@ def create_charts(df, data_types):
     # 1. Bar chart: Топ марок автомобилей по количеству продаж
     if 'make' in text_columns and len(numeric_columns) > 0:
         try:
-            # Группируем по маркам и считаем количество
-            grouped_data = df.groupby('make').size().head(10)  # Топ 10 марок
+            # Считаем количество по маркам; value_counts сортирует по убыванию
+            grouped_data = df['make'].value_counts().head(10)  # Топ 10 марок
             
             if len(grouped_data) > 0:
                 x_values = [str(x) for x in grouped_data.index]
@@ -259,7 +494,7 @@ def create_charts(df, data_types):
                 charts.append({
                     'type': 'bar',
                     'title': 'Топ 10 марок автомобилей по количеству продаж',
-                    'data': json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+                    'data': fig.to_plotly_json()
                 })
         except Exception as e:
             logger.warning(f"Ошибка создания bar chart марок: {e}")
@@ -268,7 +503,7 @@ def create_charts(df, data_types):
     if 'year' in numeric_columns and 'sellingprice' in numeric_columns:
         try:
             # Группируем по годам и считаем сумму продаж
-            grouped_data = df.groupby('year')['sellingprice'].sum().sort_index()
+            grouped_data = df.groupby('year', observed=True)['sellingprice'].sum().sort_index()
             
             if len(grouped_data) > 1:
                 x_values = [str(x) for x in grouped_data.index]
@@ -298,15 +533,21 @@ def create_charts(df, data_types):
                 charts.append({
                     'type': 'line',
                     'title': 'Общая сумма продаж по годам',
-                    'data': json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+                    'data': fig.to_plotly_json()
                 })
         except Exception as e:
             logger.warning(f"Ошибка создания line chart по годам: {e}")
     
     return charts
 
-def get_available_categories(df, data_types):
-    """Возвращает доступные категории для создания диаграмм"""
+def get_available_categories(df, data_types, analytics=None):
+    """
+    Возвращает доступные категории для создания диаграмм
+    
+    Если передан результат get_basic_analytics, число уникальных и самые
+    частые значения берутся из него, а не считаются повторно.
+    """
+    columns_info = analytics['columns_info'] if analytics else {}
     categories = {
         'text_columns': [col for col, dtype in data_types.items() if dtype == 'text'],
         'numeric_columns': [col for col, dtype in data_types.items() if dtype == 'numeric'],
@@ -316,18 +557,19 @@ def get_available_categories(df, data_types):
     # Добавляем информацию о количестве уникальных значений для каждой категории
     for col in categories['text_columns']:
         try:
-            unique_count = df[col].nunique()
-            # Преобразуем значения в строки для JSON-сериализации
-            sample_values = df[col].value_counts().head(5)
-            sample_dict = {}
-            for key, value in sample_values.items():
-                # Преобразуем ключ в строку, если это не базовый тип
-                if hasattr(key, 'strftime'):  # Timestamp или datetime
-                    sample_dict[str(key)] = int(value)
-                elif isinstance(key, pd.Timestamp):  # pandas Timestamp
-                    sample_dict[str(key)] = int(value)
-                else:
-                    sample_dict[str(key)] = int(value)
+            col_info = columns_info.get(col, {})
+            if 'unique_count' in col_info:
+                unique_count = col_info['unique_count']
+            else:
+                unique_count = df[col].nunique()
+            
+            if 'top_values' in col_info:
+                sample_dict = col_info['top_values']
+            else:
+                # Преобразуем значения в строки для JSON-сериализации
+                # сразу для всего индекса
+                sample_values = df[col].value_counts().head(5)
+                sample_dict = dict(zip(sample_values.index.astype(str), sample_values.values.tolist()))
             
             categories[col] = {
                 'type': 'text',
@@ -340,67 +582,388 @@ def get_available_categories(df, data_types):
     
     return categories
 
-def extract_table_from_pdf(filepath):
-    """Извлекает первую таблицу из PDF файла"""
+def _has_undecoded_bytes(df):
+    """Проверяет, остались ли в DataFrame не декодированные строки (bytes)"""
+    for column in df.select_dtypes(include='object').columns:
+        first_index = df[column].first_valid_index()
+        # pyarrow возвращает столбец целиком как bytes, если он не декодируется
+        if first_index is not None and isinstance(df[column].loc[first_index], bytes):
+            return True
+    return False
+
+def _read_csv_with_encoding(filepath, encoding, nrows=None):
+    """
+    Читает CSV файл, по возможности многопоточным движком pyarrow
+    
+    Движок pyarrow не поддерживает nrows, поэтому для частичного чтения
+    используется стандартный движок. Если pyarrow не справился с файлом
+    или не смог декодировать строки в указанной кодировке, файл читается
+    стандартным движком, который при неверной кодировке выбрасывает
+    UnicodeDecodeError.
+    """
+    if nrows is None:
+        try:
+            df = pd.read_csv(filepath, encoding=encoding, engine='pyarrow')
+        except Exception as e:
+            logger.debug(f"pyarrow не смог прочитать {filepath}: {e}")
+        else:
+            if not _has_undecoded_bytes(df):
+                return df
+    
+    return pd.read_csv(filepath, encoding=encoding, nrows=nrows)
+
+def detect_csv_encoding(filepath):
+    """
+    Определяет кодировку CSV файла по его началу
+    
+    Начало файла читается один раз и по очереди декодируется кодировками
+    из CSV_PROBE_ENCODINGS. Если ни одна не подошла, кодировку определяет
+    charset_normalizer, а без него используется CSV_FALLBACK_ENCODING.
+    """
+    with open(filepath, 'rb') as f:
+        head = f.read(CSV_PROBE_SIZE)
+    
+    for encoding in CSV_PROBE_ENCODINGS:
+        try:
+            # final=False допускает символ, обрезанный на границе выборки
+            codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    
+    if detect_encoding is not None:
+        match = detect_encoding(head).best()
+        if match is not None:
+            return match.encoding
+    
+    return CSV_FALLBACK_ENCODING
+
+def _read_csv(filepath, nrows=None):
+    """Читает CSV файл в кодировке, определённой по началу файла"""
+    encoding = detect_csv_encoding(filepath)
     try:
-        with pdfplumber.open(filepath) as pdf:
-            if len(pdf.pages) == 0:
-                raise ValueError("PDF файл не содержит страниц")
-            
-            # Ищем таблицы на первой странице
-            first_page = pdf.pages[0]
-            tables = first_page.extract_tables()
-            
-            if not tables:
-                raise ValueError("На первой странице PDF не найдено таблиц")
-            
-            # Берем первую найденную таблицу
-            table = tables[0]
-            
-            if not table or len(table) == 0:
-                raise ValueError("Первая таблица в PDF пуста")
-            
-            # Преобразуем таблицу в DataFrame
-            # Первая строка - заголовки
-            if len(table) < 2:
-                raise ValueError("Таблица должна содержать как минимум заголовки и одну строку данных")
-            
-            headers = table[0]
-            data_rows = table[1:]
-            
-            # Создаем DataFrame
-            df = pd.DataFrame(data_rows, columns=headers)
-            
-            # Очищаем данные
-            df = df.dropna(how='all')  # Удаляем полностью пустые строки
-            df = df.dropna(axis=1, how='all')  # Удаляем полностью пустые столбцы
-            
-            # Заменяем пустые значения на None
-            df = df.where(pd.notnull(df), None)
-            
-            # Автоматически определяем типы данных для каждого столбца
-            for column in df.columns:
-                try:
-                    # Пытаемся преобразовать в числовой тип
-                    df[column] = pd.to_numeric(df[column], errors='coerce')
-                except:
-                    pass
-                
-                # Пытаемся преобразовать в дату для всех столбцов
-                try:
-                    # Пытаемся преобразовать в дату
-                    df[column] = pd.to_datetime(df[column], errors='coerce')
-                except:
-                    pass
-            
-            logger.info(f"Извлечена таблица из PDF: {df.shape[0]} строк, {df.shape[1]} столбцов")
-            logger.info(f"Столбцы: {list(df.columns)}")
-            
-            return df
-            
+        return _read_csv_with_encoding(filepath, encoding, nrows=nrows)
+    except UnicodeDecodeError as e:
+        # Кодировка подошла для начала файла, но не для всего файла
+        logger.warning(f"Файл {filepath} не читается в кодировке {encoding}: {e}")
+        return _read_csv_with_encoding(filepath, CSV_FALLBACK_ENCODING, nrows=nrows)
+
+def _read_excel(filepath, nrows=None):
+    """
+    Читает Excel файл, по возможности движком calamine
+    
+    calamine (python-calamine) разбирает файл на Rust без создания объекта
+    на каждую ячейку. Если он не установлен или не справился с файлом,
+    используется движок pandas по умолчанию.
+    """
+    try:
+        return pd.read_excel(filepath, engine='calamine', nrows=nrows)
+    except Exception as e:
+        logger.debug(f"calamine не смог прочитать {filepath}: {e}")
+    
+    return pd.read_excel(filepath, nrows=nrows)
+
+def _get_pdf_executor():
+    """Возвращает пул процессов для разбора PDF, создавая его при первом вызове"""
+    global _pdf_executor
+    with _pdf_executor_lock:
+        if _pdf_executor is None:
+            # spawn, а не fork: процесс Flask уже запустил потоки
+            _pdf_executor = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pdf_executor
+
+def _read_pdf(filepath, nrows=None):
+    """
+    Читает первую таблицу PDF файла; таблица читается целиком
+    
+    Разбор выполняется в пуле процессов: дочерние процессы импортируют
+    только модуль pdf_tables. Если пул недоступен, PDF разбирается
+    в текущем процессе.
+    """
+    global _pdf_executor
+    try:
+        df = _get_pdf_executor().submit(extract_table_from_pdf, filepath).result()
+    except BrokenProcessPool as e:
+        logger.warning(f"Пул процессов разбора PDF недоступен: {e}")
+        with _pdf_executor_lock:
+            _pdf_executor = None
+        df = extract_table_from_pdf(filepath)
+    
+    logger.info(f"Извлечена таблица из PDF: {df.shape[0]} строк, {df.shape[1]} столбцов")
+    logger.info(f"Столбцы: {list(df.columns)}")
+    return df
+
+# Функции чтения файлов по расширению.
+# Файлы с другими расширениями читаются как Excel
+READERS = {
+    'pdf': _read_pdf,
+    'csv': _read_csv,
+    'xlsx': _read_excel,
+    'xls': _read_excel,
+}
+
+def _get_reader(filepath):
+    """Возвращает функцию чтения файла по его расширению"""
+    return READERS.get(file_extension(os.path.basename(filepath)), _read_excel)
+
+def read_data_file(filepath, file_size=None):
+    """
+    Читает Excel/CSV/PDF файл в DataFrame с оптимизацией для больших файлов
+    
+    file_size - уже известный размер файла, чтобы не запрашивать его повторно
+    """
+    reader = _get_reader(filepath)
+    
+    nrows = None
+    if reader is not _read_pdf:
+        if file_size is None:
+            file_size = os.path.getsize(filepath)
+        if file_size > LARGE_FILE_SIZE:
+            # Читаем только первые строки для предварительного анализа
+            nrows = LARGE_FILE_ROWS
+            logger.info(f"Файл большой ({file_size / 1024 / 1024:.1f}MB), читаем первые {LARGE_FILE_ROWS} строк")
+    
+    return reader(filepath, nrows=nrows)
+
+def downcast_dataframe(df):
+    """
+    Уменьшает объём памяти DataFrame
+    
+    Текстовые столбцы с небольшим числом уникальных значений переводятся
+    в category: groupby и value_counts по ним работают с целочисленными
+    кодами. Целые числа приводятся к наименьшему подходящему типу,
+    вещественные не трогаем, чтобы не терять точность статистики.
+    """
+    for column in df.columns:
+        series = df[column]
+        try:
+            if is_object_dtype(series):
+                if len(series) > 0 and series.nunique() / len(series) < CATEGORY_MAX_UNIQUE_RATIO:
+                    df[column] = series.astype('category')
+            elif is_integer_dtype(series) and not is_bool_dtype(series):
+                df[column] = pd.to_numeric(series, downcast='integer')
+        except Exception as e:
+            logger.warning(f"Ошибка преобразования типа столбца {column}: {e}")
+    
+    return df
+
+@functools.lru_cache(maxsize=8)
+def _load_cached(filepath, mtime_ns, size):
+    """
+    Читает, очищает файл и определяет типы данных с кэшированием
+    
+    Ключ кэша включает время изменения и размер файла. Очищенный DataFrame
+    дополнительно сохраняется рядом с файлом в Parquet, чтобы его можно было
+    быстро прочитать в другом процессе или после вытеснения из кэша.
+    Возвращаемый DataFrame общий для всех запросов и не должен изменяться.
+    """
+    parquet_path = filepath + PARQUET_SUFFIX
+    df = None
+    
+    try:
+        if os.stat(parquet_path).st_mtime_ns >= mtime_ns:
+            df = pd.read_parquet(parquet_path)
+    except FileNotFoundError:
+        pass
     except Exception as e:
-        logger.error(f"Ошибка извлечения таблицы из PDF: {e}")
-        raise e
+        logger.warning(f"Не удалось прочитать кэш {parquet_path}: {e}")
+    
+    if df is None:
+        df = downcast_dataframe(clean_dataframe(read_data_file(filepath, size)))
+        try:
+            df.to_parquet(parquet_path, row_group_size=PARQUET_ROW_GROUP_SIZE)
+        except Exception as e:
+            # Например, столбцы со смешанными типами значений
+            logger.warning(f"Не удалось сохранить кэш {parquet_path}: {e}")
+    
+    return df, detect_data_types(df)
+
+def stat_file(filepath):
+    """Возвращает os.stat_result файла или None, если файла нет"""
+    try:
+        return os.stat(filepath)
+    except FileNotFoundError:
+        return None
+
+def load_dataframe(filepath, stat=None):
+    """
+    Возвращает очищенный DataFrame файла и типы его данных
+    
+    stat - результат os.stat файла, если маршрут уже получил его при проверке
+    """
+    if stat is None:
+        stat = os.stat(filepath)
+    return _load_cached(filepath, stat.st_mtime_ns, stat.st_size)
+
+@functools.lru_cache(maxsize=8)
+def _analytics_cached(filepath, mtime_ns, size):
+    """
+    Считает базовую аналитику файла с кэшированием
+    
+    Ключ тот же, что у _load_cached. Возвращаемый словарь общий
+    для всех запросов и не должен изменяться.
+    """
+    df, _ = _load_cached(filepath, mtime_ns, size)
+    return get_basic_analytics(df)
+
+def load_analytics(filepath, stat=None):
+    """Возвращает базовую аналитику очищенных данных файла"""
+    if stat is None:
+        stat = os.stat(filepath)
+    return _analytics_cached(filepath, stat.st_mtime_ns, stat.st_size)
+
+def read_cached_rows(filepath, start_row, rows_count, stat=None):
+    """
+    Читает диапазон строк из Parquet кэша файла, не загружая файл целиком
+    
+    Читаются только группы строк, которые пересекаются с диапазоном.
+    Возвращает срез DataFrame и общее число строк или None,
+    если кэша нет или он устарел. stat - результат os.stat файла, если он
+    уже получен.
+    """
+    parquet_path = filepath + PARQUET_SUFFIX
+    try:
+        if stat is None:
+            stat = os.stat(filepath)
+        if os.stat(parquet_path).st_mtime_ns < stat.st_mtime_ns:
+            return None
+        parquet_file = pq.ParquetFile(parquet_path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Не удалось открыть кэш {parquet_path}: {e}")
+        return None
+    
+    metadata = parquet_file.metadata
+    total_rows = metadata.num_rows
+    end_row = min(start_row + rows_count, total_rows)
+    
+    # Ищем группы строк, пересекающиеся с диапазоном [start_row, end_row)
+    row_groups = []
+    first_group_row = 0
+    group_start = 0
+    for index in range(metadata.num_row_groups):
+        group_end = group_start + metadata.row_group(index).num_rows
+        if group_start < end_row and group_end > start_row:
+            if not row_groups:
+                first_group_row = group_start
+            row_groups.append(index)
+        group_start = group_end
+    
+    if not row_groups:
+        return parquet_file.schema_arrow.empty_table().to_pandas(), total_rows
+    
+    df = parquet_file.read_row_groups(row_groups).to_pandas()
+    offset = start_row - first_group_row
+    return df.iloc[offset:offset + end_row - start_row], total_rows
+
+def load_sample(filepath, nrows):
+    """
+    Возвращает первые nrows очищенных строк файла, не читая его целиком
+    
+    Строки берутся из Parquet кэша, а если его нет - читаются только
+    первые nrows строк самого файла (PDF таблица читается целиком).
+    """
+    cached_rows = read_cached_rows(filepath, 0, nrows)
+    if cached_rows is not None:
+        return cached_rows[0]
+    
+    return clean_dataframe(_get_reader(filepath)(filepath, nrows=nrows)).head(nrows)
+
+def save_upload(file, upload_folder):
+    """
+    Сохраняет загруженный файл под именем с хэшем его содержимого
+    
+    Файл записывается во временный файл и одновременно хэшируется.
+    Если файл с таким же содержимым и именем уже загружался, временный
+    файл удаляется, а повторные разбор и аналитика берутся из кэша.
+    Возвращает имя сохранённого файла.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    # Блоки уже крупные, поэтому пишем без дополнительной буферизации
+    temp_file = tempfile.NamedTemporaryFile(
+        dir=upload_folder, suffix='.tmp', delete=False, buffering=0
+    )
+    try:
+        with temp_file:
+            while True:
+                chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                temp_file.write(chunk)
+        
+        filename = f"{digest.hexdigest()}_{secure_filename(file.filename)}"
+        filepath = os.path.join(upload_folder, filename)
+        if os.path.exists(filepath):
+            logger.info(f"Файл {filename} уже загружен, используем сохранённую копию")
+            os.remove(temp_file.name)
+        else:
+            os.replace(temp_file.name, filepath)
+    except Exception:
+        if os.path.exists(temp_file.name):
+            os.remove(temp_file.name)
+        raise
+    
+    return filename
+
+def submit_analysis_job(function, *args, progress=False):
+    """
+    Запускает анализ нейросетью или генерацию PDF в фоновом потоке
+    и возвращает id задачи
+    
+    function должна вернуть пару (ответ, HTTP код). При progress=True
+    последним аргументом function получает функцию, которой передаёт уже
+    сгенерированный текст, и /analysis_status отдаёт его до завершения задачи.
+    Завершённые задачи старше ANALYSIS_JOB_TTL секунд удаляются. Задачи
+    хранятся в памяти процесса, поэтому опрашивать их нужно у того же процесса.
+    """
+    now = time.monotonic()
+    with _analysis_jobs_lock:
+        expired = [
+            job_id for job_id, (created_at, future) in _analysis_jobs.items()
+            if future.done() and now - created_at > ANALYSIS_JOB_TTL
+        ]
+        for job_id in expired:
+            del _analysis_jobs[job_id]
+            _analysis_progress.pop(job_id, None)
+        
+        job_id = uuid.uuid4().hex
+        if progress:
+            args = (*args, functools.partial(_set_analysis_progress, job_id))
+        _analysis_jobs[job_id] = (now, _analysis_executor.submit(function, *args))
+    return job_id
+
+def _set_analysis_progress(job_id, text):
+    """Сохраняет текст, уже сгенерированный фоновой задачей"""
+    with _analysis_jobs_lock:
+        _analysis_progress[job_id] = text
+
+def analysis_cache_key(model, df_sample, filename):
+    """Ключ кэша анализа: анализатор, имя файла и хэш отправляемых строк"""
+    sample_text = df_sample.to_csv(index=False)
+    digest = hashlib.blake2b(sample_text.encode('utf-8'), digest_size=16)
+    return f"{model}:{filename}:{digest.hexdigest()}"
+
+def get_cached_analysis(cache_key):
+    """Возвращает сохранённый результат анализа или None"""
+    try:
+        with _analysis_cache_lock, shelve.open(ANALYSIS_CACHE_PATH, 'r') as cache:
+            return cache.get(cache_key)
+    except Exception:
+        # Кэш ещё не создан или повреждён - анализ выполнится заново
+        return None
+
+def save_cached_analysis(cache_key, analysis_result):
+    """Сохраняет успешный результат анализа в кэш"""
+    try:
+        with _analysis_cache_lock, shelve.open(ANALYSIS_CACHE_PATH) as cache:
+            cache[cache_key] = analysis_result
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить анализ в кэш: {e}")
 
 # Маршруты Flask
 @app.route('/')
@@ -433,99 +996,41 @@ def upload_file():
         if not allowed_file(file.filename):
             return jsonify({'error': 'Неподдерживаемый тип файла. Разрешены: xlsx, xls, csv, pdf'}), 400
         
-        # Сохраняем файл
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{filename}"
+        # Сохраняем файл; одинаковые загрузки не дублируются
+        filename = save_upload(file, app.config['UPLOAD_FOLDER'])
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        # Читаем файл с оптимизацией для больших файлов
-        try:
-            if filename.endswith('.pdf'):
-                # Для PDF файлов извлекаем таблицу
-                df = extract_table_from_pdf(filepath)
-            elif filename.endswith('.csv'):
-                # Для CSV файлов используем chunking для больших файлов
-                file_size = os.path.getsize(filepath)
-                if file_size > 10 * 1024 * 1024:  # Если файл больше 10MB
-                    # Читаем только первые 10000 строк для предварительного анализа
-                    df = pd.read_csv(filepath, encoding='utf-8', nrows=10000)
-                    logger.info(f"Файл большой ({file_size / 1024 / 1024:.1f}MB), читаем первые 10000 строк")
-                else:
-                    df = pd.read_csv(filepath, encoding='utf-8')
-            else:
-                # Для Excel файлов
-                file_size = os.path.getsize(filepath)
-                if file_size > 10 * 1024 * 1024:  # Если файл больше 10MB
-                    # Читаем только первые 10000 строк
-                    df = pd.read_excel(filepath, nrows=10000)
-                    logger.info(f"Файл большой ({file_size / 1024 / 1024:.1f}MB), читаем первые 10000 строк")
-                else:
-                    df = pd.read_excel(filepath)
-        except Exception as e:
-            # Пробуем другие кодировки для CSV
-            if filename.endswith('.csv'):
-                try:
-                    file_size = os.path.getsize(filepath)
-                    if file_size > 10 * 1024 * 1024:
-                        df = pd.read_csv(filepath, encoding='cp1251', nrows=10000)
-                    else:
-                        df = pd.read_csv(filepath, encoding='cp1251')
-                except:
-                    try:
-                        file_size = os.path.getsize(filepath)
-                        if file_size > 10 * 1024 * 1024:
-                            df = pd.read_csv(filepath, encoding='latin-1', nrows=10000)
-                        else:
-                            df = pd.read_csv(filepath, encoding='latin-1')
-                    except:
-                        raise e
-            else:
-                raise e
-        
-        # Очищаем данные
-        df = df.dropna(how='all')  # Удаляем полностью пустые строки
-        df = df.dropna(axis=1, how='all')  # Удаляем полностью пустые столбцы
         
-        # Заменяем NaN значения на None для корректной JSON сериализации
-        df = df.where(pd.notnull(df), None)
-        
-        # Дополнительная обработка пустых значений
-        df = df.replace(['', ' ', '  ', '   '], None)  # Заменяем пустые строки на None
-        df = df.replace(['nan', 'NaN', 'NAN'], None)  # Заменяем строковые 'nan' на None
+        # Читаем и очищаем файл; результат кэшируется для остальных маршрутов
+        stat = os.stat(filepath)
+        df, data_types = load_dataframe(filepath, stat)
         
         # Логируем информацию о типах данных для отладки
         logger.info(f"Типы данных в DataFrame: {dict(df.dtypes)}")
         logger.info(f"Размер DataFrame: {df.shape}")
         
-        # Определяем типы данных
-        data_types = detect_data_types(df)
-        
-        # Получаем базовую аналитику
-        analytics = get_basic_analytics(df)
-        
-        # Создаем диаграммы
-        charts = create_charts(df, data_types)
-        
-        # Получаем доступные категории для диаграмм
-        categories = get_available_categories(df, data_types)
-        
-        # Подготавливаем первые 100 строк для отображения
-        df_display = df.head(100)
+        # Аналитика, диаграммы и первые 100 строк для отображения считаются
+        # независимо друг от друга по одному DataFrame, поэтому запускаем их
+        # параллельно: numpy отпускает GIL в большинстве операций
+        with ThreadPoolExecutor(max_workers=ANALYTICS_WORKERS) as executor:
+            analytics_future = executor.submit(load_analytics, filepath, stat)
+            charts_future = executor.submit(create_charts, df, data_types)
+            records_future = executor.submit(dataframe_to_records, df.head(100))
+            
+            analytics = analytics_future.result()
+            # Категории используют уже посчитанную аналитику
+            categories = get_available_categories(df, data_types, analytics)
         
-        # Конвертируем DataFrame в JSON-безопасный формат
-        df_display_clean = convert_dataframe_to_json_safe(df_display)
-        data_json = df_display_clean.to_json(orient='records', date_format='iso')
+        charts = charts_future.result()
+        records = records_future.result()
         
-        # Получаем размер файла
-        file_size = os.path.getsize(filepath)
+        # Размер файла берём из уже полученного stat
+        file_size = stat.st_size
         file_size_mb = file_size / (1024 * 1024)
         
         return jsonify({
             'success': True,
             'filename': filename,
-            'data': json.loads(data_json),
+            'data': records,
             'columns': list(df.columns),
             'total_rows': len(df),
             'data_types': data_types,
@@ -558,41 +1063,33 @@ def load_more_data():
         
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         
-        if not os.path.exists(filepath):
+        stat = stat_file(filepath)
+        if stat is None:
             return jsonify({'error': 'Файл не найден'}), 404
         
-        # Читаем файл
-        if filename.endswith('.pdf'):
-            df = extract_table_from_pdf(filepath)
-        elif filename.endswith('.csv'):
-            df = pd.read_csv(filepath, encoding='utf-8')
+        # Читаем только нужные строки из Parquet кэша, а если его нет,
+        # берём срез очищенных данных из кэша в памяти
+        cached_rows = read_cached_rows(filepath, start_row, rows_count, stat)
+        if cached_rows is not None:
+            df_slice, total_rows = cached_rows
         else:
-            df = pd.read_excel(filepath)
-        
-        # Очищаем данные
-        df = df.dropna(how='all')
-        df = df.dropna(axis=1, how='all')
-        
-        # Заменяем NaN значения на None для корректной JSON сериализации
-        df = df.where(pd.notnull(df), None)
+            df, _ = load_dataframe(filepath, stat)
+            total_rows = len(df)
+            df_slice = df.iloc[start_row:start_row + rows_count]
+        end_row = start_row + len(df_slice)
         
         # Логируем информацию о типах данных для отладки
-        logger.info(f"Типы данных в load_more: {dict(df.dtypes)}")
-        
-        # Получаем нужный диапазон строк
-        end_row = min(start_row + rows_count, len(df))
-        df_slice = df.iloc[start_row:end_row]
+        logger.info(f"Типы данных в load_more: {dict(df_slice.dtypes)}")
         
         # Конвертируем в JSON-безопасный формат
-        df_slice_clean = convert_dataframe_to_json_safe(df_slice)
-        data_json = df_slice_clean.to_json(orient='records', date_format='iso')
+        records = dataframe_to_records(df_slice)
         
         return jsonify({
             'success': True,
-            'data': json.loads(data_json),
+            'data': records,
             'start_row': start_row,
             'end_row': end_row,
-            'has_more_data': end_row < len(df)
+            'has_more_data': end_row < total_rows
         })
         
     except Exception as e:
@@ -613,30 +1110,18 @@ def create_custom_chart():
         
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         
-        if not os.path.exists(filepath):
+        stat = stat_file(filepath)
+        if stat is None:
             return jsonify({'error': 'Файл не найден'}), 404
         
-        # Читаем файл
-        if filename.endswith('.pdf'):
-            df = extract_table_from_pdf(filepath)
-        elif filename.endswith('.csv'):
-            df = pd.read_csv(filepath, encoding='utf-8')
-        else:
-            df = pd.read_excel(filepath)
-        
-        # Очищаем данные
-        df = df.dropna(how='all')
-        df = df.dropna(axis=1, how='all')
-        df = df.where(pd.notnull(df), None)
-        
-        # Определяем типы данных
-        data_types = detect_data_types(df)
+        # Берём очищенные данные и типы из кэша
+        df, data_types = load_dataframe(filepath, stat)
         
         # Создаем диаграмму
         if chart_type == 'bar':
             # Bar chart: количество по категории
             try:
-                grouped_data = df.groupby(category).size().head(15)  # Топ 15
+                grouped_data = df[category].value_counts().head(15)  # Топ 15
                 
                 if len(grouped_data) > 0:
                     x_values = [str(x) for x in grouped_data.index]
@@ -662,7 +1147,7 @@ def create_custom_chart():
                         height=400
                     )
                     
-                    chart_data = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+                    chart_data = fig.to_plotly_json()
                     
                     return jsonify({
                         'success': True,
@@ -685,7 +1170,7 @@ def create_custom_chart():
             if len(numeric_columns) > 0:
                 try:
                     value_col = numeric_columns[0]  # Берем первый числовой столбец
-                    grouped_data = df.groupby(category)[value_col].sum().sort_index()
+                    grouped_data = df.groupby(category, observed=True)[value_col].sum().sort_index()
                     
                     if len(grouped_data) > 1:
                         x_values = [str(x) for x in grouped_data.index]
@@ -711,7 +1196,7 @@ def create_custom_chart():
                             height=400
                         )
                         
-                        chart_data = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+                        chart_data = fig.to_plotly_json()
                         
                         return jsonify({
                             'success': True,
@@ -737,393 +1222,491 @@ def create_custom_chart():
         logger.error(f"Ошибка создания диаграммы: {e}")
         return jsonify({'error': f'Ошибка создания диаграммы: {str(e)}'}), 500
 
+def _completed_analysis(analysis_result):
+    """Описание успешно завершённого анализа для ответа клиенту"""
+    return {
+        'status': 'completed',
+        'message': 'Анализ завершен успешно',
+        'content': analysis_result['analysis'],
+        'model': analysis_result['model'],
+        'filename': analysis_result['filename']
+    }
+
+def _analysis_response(analysis_result):
+    """Ответ маршрута анализа одной нейросетью"""
+    return {'success': True, 'analysis': _completed_analysis(analysis_result)}
+
+def _run_yandex_analysis(filepath, filename, report_progress=None):
+    """
+    Выполняет анализ Яндекс.GPT в фоновой задаче, возвращает ответ и HTTP код
+    
+    Если передана report_progress, ответ читается потоком и ей передаётся
+    уже сгенерированный текст.
+    """
+    try:
+        # Для анализа нужны только первые строки, весь файл не читаем
+        logger.debug("📊 [YANDEX] Загружаем первые строки файла...")
+        df_sample = load_sample(filepath, LLM_SAMPLE_ROWS)
+        
+        logger.debug("📋 [YANDEX] Подготовлено %s строк для анализа", len(df_sample))
+        
+        # Яндекс.GPT форматирует DataFrame для промпта сам
+        table_data = df_sample
+        
+        # Те же строки уже анализировались - отдаём сохранённый результат
+        cache_key = analysis_cache_key('yandex', df_sample, filename)
+        analysis_result = get_cached_analysis(cache_key)
+        if analysis_result is not None:
+            logger.debug("💾 [YANDEX] Анализ взят из кэша")
+            return _analysis_response(analysis_result), 200
+        
+        # Создаем анализатор Яндекс.GPT
+        logger.debug("🔧 [YANDEX] Инициализируем анализатор Яндекс.GPT...")
+        analyzer = create_yandex_analyzer()
+        if not analyzer:
+            logger.debug("❌ [YANDEX] Ошибка: не удалось инициализировать анализатор")
+            return {
+                'error': 'Не удалось инициализировать анализатор Яндекс.GPT. Проверьте настройки в .env файле.'
+            }, 500
+        
+        logger.debug("✅ [YANDEX] Анализатор Яндекс.GPT инициализирован")
+        
+        # Выполняем анализ
+        logger.debug("🚀 [YANDEX] Запускаем анализ через Яндекс.GPT...")
+        logger.info(f"Запускаем анализ файла {filename} через Яндекс.GPT")
+        analysis_result = analyzer.analyze_table_data(table_data, filename, on_progress=report_progress)
+        
+        if analysis_result['success']:
+            save_cached_analysis(cache_key, analysis_result)
+            analysis_length = len(analysis_result['analysis'])
+            logger.debug("✅ [YANDEX] Анализ завершён успешно!")
+            logger.debug("📊 [YANDEX] Длина ответа: %s символов", analysis_length)
+            logger.debug("🤖 [YANDEX] Модель: %s", analysis_result['model'])
+            return _analysis_response(analysis_result), 200
+        else:
+            logger.debug("❌ [YANDEX] Ошибка анализа: %s", analysis_result['error'])
+            return {
+                'success': False,
+                'error': analysis_result['error']
+            }, 500
+        
+    except Exception as e:
+        logger.debug("❌ [YANDEX] Критическая ошибка: %s", e)
+        logger.debug("🔍 [YANDEX] Трассировка ошибки", exc_info=True)
+        logger.error(f"Ошибка Yandex анализа: {e}")
+        return {'error': f'Ошибка анализа: {str(e)}'}, 500
+
 @app.route('/yandex_analysis', methods=['POST'])
 def yandex_analysis():
     """Анализ данных с помощью Яндекс.GPT"""
     try:
-        print("🤖 [YANDEX] Начало анализа через Яндекс.GPT")
+        logger.debug("🤖 [YANDEX] Начало анализа через Яндекс.GPT")
         data = request.get_json()
         filename = data.get('filename')
         
-        print(f"📄 [YANDEX] Запрошен файл для анализа: {filename}")
+        logger.debug("📄 [YANDEX] Запрошен файл для анализа: %s", filename)
         
         if not filename:
-            print("❌ [YANDEX] Ошибка: не указано имя файла")
+            logger.debug("❌ [YANDEX] Ошибка: не указано имя файла")
             return jsonify({'error': 'Имя файла не указано'}), 400
         
         # Проверяем, что файл существует
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        if not os.path.exists(filepath):
-            print(f"❌ [YANDEX] Ошибка: файл не найден - {filepath}")
+        stat = stat_file(filepath)
+        if stat is None:
+            logger.debug("❌ [YANDEX] Ошибка: файл не найден - %s", filepath)
             return jsonify({'error': 'Файл не найден'}), 404
         
-        print(f"✅ [YANDEX] Файл найден: {filepath}")
+        logger.debug("✅ [YANDEX] Файл найден: %s", filepath)
         
-        # Читаем файл для получения первых 15 строк
-        try:
-            if filename.endswith('.pdf'):
-                print("📊 [YANDEX] Читаем PDF файл...")
-                df = extract_table_from_pdf(filepath)
-            elif filename.endswith('.csv'):
-                print("📊 [YANDEX] Читаем CSV файл (первые 15 строк)...")
-                df = pd.read_csv(filepath, encoding='utf-8', nrows=15)
-            else:
-                print("📊 [YANDEX] Читаем Excel файл (первые 15 строк)...")
-                df = pd.read_excel(filepath, nrows=15)
-        except Exception as e:
-            print(f"⚠️ [YANDEX] Ошибка чтения с UTF-8, пробуем другие кодировки...")
-            # Пробуем другие кодировки для CSV
-            if filename.endswith('.csv'):
-                try:
-                    print("📊 [YANDEX] Пробуем кодировку cp1251...")
-                    df = pd.read_csv(filepath, encoding='cp1251', nrows=15)
-                except:
-                    try:
-                        print("📊 [YANDEX] Пробуем кодировку latin-1...")
-                        df = pd.read_csv(filepath, encoding='latin-1', nrows=15)
-                    except:
-                        print(f"❌ [YANDEX] Критическая ошибка чтения файла: {str(e)}")
-                        return jsonify({'error': f'Ошибка чтения файла: {str(e)}'}), 500
-            else:
-                print(f"❌ [YANDEX] Критическая ошибка чтения файла: {str(e)}")
-                return jsonify({'error': f'Ошибка чтения файла: {str(e)}'}), 500
+        # Запрос к нейросети выполняется в фоновой задаче, клиент
+        # получает её идентификатор и опрашивает /analysis_status,
+        # получая уже сгенерированную часть ответа
+        job_id = submit_analysis_job(_run_yandex_analysis, filepath, filename, progress=True)
+        logger.debug("⏳ [YANDEX] Анализ поставлен в очередь: %s", job_id)
+        return jsonify({'success': True, 'status': 'pending', 'job_id': job_id}), 202
         
-        print(f"📈 [YANDEX] Данные загружены: {len(df)} строк, {len(df.columns)} столбцов")
+    except Exception as e:
+        logger.error(f"Ошибка запуска анализа Яндекс.GPT: {e}")
+        return jsonify({'error': f'Ошибка анализа: {str(e)}'}), 500
+
+def _run_gigachat_analysis(filepath, filename):
+    """Выполняет анализ GigaChat в фоновой задаче, возвращает ответ и HTTP код"""
+    try:
+        # Для анализа нужны только первые строки, весь файл не читаем
+        logger.debug("📊 [GIGACHAT] Загружаем первые строки файла...")
+        df_sample = load_sample(filepath, LLM_SAMPLE_ROWS)
         
-        # Очищаем данные
-        print("🧹 [YANDEX] Очищаем данные...")
-        df = df.dropna(how='all')
-        df = df.dropna(axis=1, how='all')
-        df = df.where(pd.notnull(df), None)
+        logger.debug("📋 [GIGACHAT] Подготовлено %s строк для анализа", len(df_sample))
         
-        # Берем первые 15 строк для анализа
-        df_sample = df.head(15)
-        print(f"📋 [YANDEX] Подготовлено {len(df_sample)} строк для анализа")
+        # GigaChat форматирует DataFrame для промпта сам
+        table_data = df_sample
         
-        # Конвертируем в JSON-безопасный формат
-        df_sample_clean = convert_dataframe_to_json_safe(df_sample)
-        table_data = df_sample_clean.to_dict('records')
-        print(f"🔄 [YANDEX] Данные конвертированы в JSON формат")
+        # Те же строки уже анализировались - отдаём сохранённый результат
+        cache_key = analysis_cache_key('gigachat', df_sample, filename)
+        analysis_result = get_cached_analysis(cache_key)
+        if analysis_result is not None:
+            logger.debug("💾 [GIGACHAT] Анализ взят из кэша")
+            return _analysis_response(analysis_result), 200
         
-        # Создаем анализатор Яндекс.GPT
-        print("🔧 [YANDEX] Инициализируем анализатор Яндекс.GPT...")
-        analyzer = create_yandex_analyzer()
+        # Создаем анализатор GigaChat
+        logger.debug("🔧 [GIGACHAT] Инициализируем анализатор GigaChat...")
+        analyzer = create_gigachat_analyzer()
         if not analyzer:
-            print("❌ [YANDEX] Ошибка: не удалось инициализировать анализатор")
-            return jsonify({
-                'error': 'Не удалось инициализировать анализатор Яндекс.GPT. Проверьте настройки в .env файле.'
-            }), 500
+            logger.debug("❌ [GIGACHAT] Ошибка: не удалось инициализировать анализатор")
+            return {
+                'error': 'Не удалось инициализировать анализатор GigaChat. Проверьте настройки в .env файле.'
+            }, 500
         
-        print("✅ [YANDEX] Анализатор Яндекс.GPT инициализирован")
+        logger.debug("✅ [GIGACHAT] Анализатор GigaChat инициализирован")
         
         # Выполняем анализ
-        print("🚀 [YANDEX] Запускаем анализ через Яндекс.GPT...")
-        logger.info(f"Запускаем анализ файла {filename} через Яндекс.GPT")
+        logger.debug("🚀 [GIGACHAT] Запускаем анализ через GigaChat...")
+        logger.info(f"Запускаем анализ файла {filename} через GigaChat")
         analysis_result = analyzer.analyze_table_data(table_data, filename)
         
         if analysis_result['success']:
+            save_cached_analysis(cache_key, analysis_result)
             analysis_length = len(analysis_result['analysis'])
-            print(f"✅ [YANDEX] Анализ завершён успешно!")
-            print(f"📊 [YANDEX] Длина ответа: {analysis_length} символов")
-            print(f"🤖 [YANDEX] Модель: {analysis_result['model']}")
-            return jsonify({
-                'success': True,
-                'analysis': {
-                    'status': 'completed',
-                    'message': 'Анализ завершен успешно',
-                    'content': analysis_result['analysis'],
-                    'model': analysis_result['model'],
-                    'filename': analysis_result['filename']
-                }
-            })
+            logger.debug("✅ [GIGACHAT] Анализ завершён успешно!")
+            logger.debug("📊 [GIGACHAT] Длина ответа: %s символов", analysis_length)
+            logger.debug("🤖 [GIGACHAT] Модель: %s", analysis_result['model'])
+            return _analysis_response(analysis_result), 200
         else:
-            print(f"❌ [YANDEX] Ошибка анализа: {analysis_result['error']}")
-            return jsonify({
+            logger.debug("❌ [GIGACHAT] Ошибка анализа: %s", analysis_result['error'])
+            return {
                 'success': False,
                 'error': analysis_result['error']
-            }), 500
+            }, 500
         
     except Exception as e:
-        print(f"❌ [YANDEX] Критическая ошибка: {str(e)}")
-        import traceback
-        print(f"🔍 [YANDEX] Трассировка ошибки:\n{traceback.format_exc()}")
-        logger.error(f"Ошибка Yandex анализа: {e}")
-        return jsonify({'error': f'Ошибка анализа: {str(e)}'}), 500
+        logger.debug("❌ [GIGACHAT] Критическая ошибка: %s", e)
+        logger.debug("🔍 [GIGACHAT] Трассировка ошибки", exc_info=True)
+        logger.error(f"Ошибка GigaChat анализа: {e}")
+        return {'error': f'Ошибка анализа: {str(e)}'}, 500
 
 @app.route('/gigachat_analysis', methods=['POST'])
 def gigachat_analysis():
     """Анализ данных с помощью GigaChat"""
     try:
-        print("🤖 [GIGACHAT] Начало анализа через GigaChat")
+        logger.debug("🤖 [GIGACHAT] Начало анализа через GigaChat")
         data = request.get_json()
         filename = data.get('filename')
         
-        print(f"📄 [GIGACHAT] Запрошен файл для анализа: {filename}")
+        logger.debug("📄 [GIGACHAT] Запрошен файл для анализа: %s", filename)
         
         if not filename:
-            print("❌ [GIGACHAT] Ошибка: не указано имя файла")
+            logger.debug("❌ [GIGACHAT] Ошибка: не указано имя файла")
             return jsonify({'error': 'Имя файла не указано'}), 400
         
         # Проверяем, что файл существует
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        if not os.path.exists(filepath):
-            print(f"❌ [GIGACHAT] Ошибка: файл не найден - {filepath}")
+        stat = stat_file(filepath)
+        if stat is None:
+            logger.debug("❌ [GIGACHAT] Ошибка: файл не найден - %s", filepath)
             return jsonify({'error': 'Файл не найден'}), 404
         
-        print(f"✅ [GIGACHAT] Файл найден: {filepath}")
-        
-        # Читаем файл для получения первых 15 строк
-        try:
-            if filename.endswith('.pdf'):
-                print("📊 [GIGACHAT] Читаем PDF файл...")
-                df = extract_table_from_pdf(filepath)
-            elif filename.endswith('.csv'):
-                print("📊 [GIGACHAT] Читаем CSV файл...")
-                df = pd.read_csv(filepath, encoding='utf-8')
-            else:
-                print("📊 [GIGACHAT] Читаем Excel файл...")
-                df = pd.read_excel(filepath)
-        except Exception as e:
-            print(f"⚠️ [GIGACHAT] Ошибка чтения с UTF-8, пробуем другие кодировки...")
-            # Пробуем другие кодировки для CSV
-            if filename.endswith('.csv'):
-                try:
-                    print("📊 [GIGACHAT] Пробуем кодировку cp1251...")
-                    df = pd.read_csv(filepath, encoding='cp1251')
-                except:
-                    try:
-                        print("📊 [GIGACHAT] Пробуем кодировку latin-1...")
-                        df = pd.read_csv(filepath, encoding='latin-1')
-                    except:
-                        print(f"❌ [GIGACHAT] Критическая ошибка чтения файла: {str(e)}")
-                        return jsonify({'error': f'Ошибка чтения файла: {str(e)}'}), 500
-            else:
-                print(f"❌ [GIGACHAT] Критическая ошибка чтения файла: {str(e)}")
-                return jsonify({'error': f'Ошибка чтения файла: {str(e)}'}), 500
+        logger.debug("✅ [GIGACHAT] Файл найден: %s", filepath)
         
-        print(f"📈 [GIGACHAT] Данные загружены: {len(df)} строк, {len(df.columns)} столбцов")
+        # Запрос к нейросети выполняется в фоновой задаче, клиент
+        # получает её идентификатор и опрашивает /analysis_status
+        job_id = submit_analysis_job(_run_gigachat_analysis, filepath, filename)
+        logger.debug("⏳ [GIGACHAT] Анализ поставлен в очередь: %s", job_id)
+        return jsonify({'success': True, 'status': 'pending', 'job_id': job_id}), 202
         
-        # Очищаем данные
-        print("🧹 [GIGACHAT] Очищаем данные...")
-        df = df.dropna(how='all')
-        df = df.dropna(axis=1, how='all')
-        df = df.where(pd.notnull(df), None)
+    except Exception as e:
+        logger.error(f"Ошибка запуска анализа GigaChat: {e}")
+        return jsonify({'error': f'Ошибка анализа: {str(e)}'}), 500
+
+def _run_table_analysis(create_analyzer, table_data, filename, cache_key):
+    """Создаёт анализатор и выполняет анализ таблицы, если его нет в кэше"""
+    analysis_result = get_cached_analysis(cache_key)
+    if analysis_result is not None:
+        return analysis_result
+    
+    analyzer = create_analyzer()
+    if not analyzer:
+        return {
+            'success': False,
+            'error': 'Не удалось инициализировать анализатор. Проверьте настройки в .env файле.'
+        }
+    analysis_result = analyzer.analyze_table_data(table_data, filename)
+    if analysis_result['success']:
+        save_cached_analysis(cache_key, analysis_result)
+    return analysis_result
+
+def _run_dual_analysis(filepath, filename):
+    """Выполняет оба анализа в фоновой задаче, возвращает ответ и HTTP код"""
+    try:
+        # Первые строки файла читаем один раз и отправляем обеим моделям;
+        # таблицу для промпта каждый анализатор форматирует из DataFrame сам
+        df_sample = load_sample(filepath, LLM_SAMPLE_ROWS)
+        
+        # SDK обеих моделей синхронные, поэтому запросы выполняем в потоках:
+        # общее время равно времени более медленной модели, а не сумме
+        logger.info(f"Запускаем анализ файла {filename} через Яндекс.GPT и GigaChat")
+        analyzers = {
+            'yandex': create_yandex_analyzer,
+            'gigachat': create_gigachat_analyzer
+        }
+        with ThreadPoolExecutor(max_workers=len(analyzers)) as executor:
+            futures = {
+                name: executor.submit(
+                    _run_table_analysis, create_analyzer, df_sample, filename,
+                    analysis_cache_key(name, df_sample, filename)
+                )
+                for name, create_analyzer in analyzers.items()
+            }
         
-        # Берем первые 15 строк для анализа
-        df_sample = df.head(15)
-        print(f"📋 [GIGACHAT] Подготовлено {len(df_sample)} строк для анализа")
+        analyses = {}
+        for name, future in futures.items():
+            try:
+                analysis_result = future.result()
+            except Exception as e:
+                logger.error(f"Ошибка анализа {name}: {e}")
+                analysis_result = {'success': False, 'error': str(e)}
+            
+            if analysis_result['success']:
+                analyses[name] = _completed_analysis(analysis_result)
+            else:
+                analyses[name] = {
+                    'status': 'error',
+                    'error': analysis_result['error']
+                }
         
-        # Конвертируем в JSON-безопасный формат
-        df_sample_clean = convert_dataframe_to_json_safe(df_sample)
-        table_data = df_sample_clean.to_dict('records')
-        print(f"🔄 [GIGACHAT] Данные конвертированы в JSON формат")
+        return {
+            'success': any(analysis['status'] == 'completed' for analysis in analyses.values()),
+            'analyses': analyses
+        }, 200
         
-        # Создаем анализатор GigaChat
-        print("🔧 [GIGACHAT] Инициализируем анализатор GigaChat...")
-        analyzer = create_gigachat_analyzer()
-        if not analyzer:
-            print("❌ [GIGACHAT] Ошибка: не удалось инициализировать анализатор")
-            return jsonify({
-                'error': 'Не удалось инициализировать анализатор GigaChat. Проверьте настройки в .env файле.'
-            }), 500
+    except Exception as e:
+        logger.error(f"Ошибка совместного анализа: {e}")
+        return {'error': f'Ошибка анализа: {str(e)}'}, 500
+
+@app.route('/dual_analysis', methods=['POST'])
+def dual_analysis():
+    """Анализ данных одновременно Яндекс.GPT и GigaChat"""
+    try:
+        data = request.get_json()
+        filename = data.get('filename')
         
-        print("✅ [GIGACHAT] Анализатор GigaChat инициализирован")
+        if not filename:
+            return jsonify({'error': 'Имя файла не указано'}), 400
         
-        # Выполняем анализ
-        print("🚀 [GIGACHAT] Запускаем анализ через GigaChat...")
-        logger.info(f"Запускаем анализ файла {filename} через GigaChat")
-        analysis_result = analyzer.analyze_table_data(table_data, filename)
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        stat = stat_file(filepath)
+        if stat is None:
+            return jsonify({'error': 'Файл не найден'}), 404
         
-        if analysis_result['success']:
-            analysis_length = len(analysis_result['analysis'])
-            print(f"✅ [GIGACHAT] Анализ завершён успешно!")
-            print(f"📊 [GIGACHAT] Длина ответа: {analysis_length} символов")
-            print(f"🤖 [GIGACHAT] Модель: {analysis_result['model']}")
-            return jsonify({
-                'success': True,
-                'analysis': {
-                    'status': 'completed',
-                    'message': 'Анализ завершен успешно',
-                    'content': analysis_result['analysis'],
-                    'model': analysis_result['model'],
-                    'filename': analysis_result['filename']
-                }
-            })
-        else:
-            print(f"❌ [GIGACHAT] Ошибка анализа: {analysis_result['error']}")
-            return jsonify({
-                'success': False,
-                'error': analysis_result['error']
-            }), 500
+        job_id = submit_analysis_job(_run_dual_analysis, filepath, filename)
+        return jsonify({'success': True, 'status': 'pending', 'job_id': job_id}), 202
         
     except Exception as e:
-        print(f"❌ [GIGACHAT] Критическая ошибка: {str(e)}")
-        import traceback
-        print(f"🔍 [GIGACHAT] Трассировка ошибки:\n{traceback.format_exc()}")
-        logger.error(f"Ошибка GigaChat анализа: {e}")
+        logger.error(f"Ошибка запуска совместного анализа: {e}")
+        return jsonify({'error': f'Ошибка анализа: {str(e)}'}), 500
+
+@app.route('/analysis_status/<job_id>')
+def analysis_status(job_id):
+    """Возвращает состояние или результат фоновой задачи анализа"""
+    with _analysis_jobs_lock:
+        job = _analysis_jobs.get(job_id)
+    
+    if job is None:
+        return jsonify({'error': 'Задача анализа не найдена'}), 404
+    
+    _, future = job
+    if not future.done():
+        payload = {'success': True, 'status': 'pending', 'job_id': job_id}
+        with _analysis_jobs_lock:
+            partial_analysis = _analysis_progress.get(job_id)
+        if partial_analysis:
+            payload['partial_analysis'] = partial_analysis
+        return jsonify(payload), 202
+    
+    try:
+        payload, status_code = future.result()
+    except Exception as e:
+        logger.error(f"Ошибка задачи анализа {job_id}: {e}")
         return jsonify({'error': f'Ошибка анализа: {str(e)}'}), 500
+    return jsonify(payload), status_code
 
 @app.route('/generate_pdf', methods=['POST'])
 def generate_pdf():
     """Генерация PDF отчета на сервере"""
     try:
-        print("🔄 [PDF] Начало генерации PDF отчёта")
+        logger.debug("🔄 [PDF] Начало генерации PDF отчёта")
         data = request.get_json()
         filename = data.get('filename')
         yandex_analysis = data.get('yandex_analysis', '')
         gigachat_analysis = data.get('gigachat_analysis', '')
         
-        print(f"📄 [PDF] Запрошен файл: {filename}")
-        print(f"🤖 [PDF] Яндекс.GPT анализ получен: {'Да' if yandex_analysis else 'Нет'}")
-        print(f"🤖 [PDF] GigaChat анализ получен: {'Да' if gigachat_analysis else 'Нет'}")
+        # Данные, уже посчитанные при загрузке файла; если страница их
+        # не прислала, отчёт строится по самому файлу
+        report_data = None
+        if all(data.get(field) is not None for field in PDF_REPORT_FIELDS):
+            report_data = {field: data[field] for field in PDF_REPORT_FIELDS}
+        
+        logger.debug("📄 [PDF] Запрошен файл: %s", filename)
+        logger.debug("🤖 [PDF] Яндекс.GPT анализ получен: %s", 'Да' if yandex_analysis else 'Нет')
+        logger.debug("🤖 [PDF] GigaChat анализ получен: %s", 'Да' if gigachat_analysis else 'Нет')
         
         if not filename:
-            print("❌ [PDF] Ошибка: не указано имя файла")
+            logger.debug("❌ [PDF] Ошибка: не указано имя файла")
             return jsonify({'error': 'Имя файла не указано'}), 400
         
         # Проверяем, что файл существует
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        if not os.path.exists(filepath):
-            print(f"❌ [PDF] Ошибка: файл не найден - {filepath}")
+        stat = stat_file(filepath)
+        if stat is None:
+            logger.debug("❌ [PDF] Ошибка: файл не найден - %s", filepath)
             return jsonify({'error': 'Файл не найден'}), 404
         
-        print(f"✅ [PDF] Файл найден: {filepath}")
-        
-        # Читаем файл
-        try:
-            if filename.endswith('.pdf'):
-                print("📊 [PDF] Читаем PDF файл...")
-                df = extract_table_from_pdf(filepath)
-            elif filename.endswith('.csv'):
-                print("📊 [PDF] Читаем CSV файл...")
-                df = pd.read_csv(filepath, encoding='utf-8')
-            else:
-                print("📊 [PDF] Читаем Excel файл...")
-                df = pd.read_excel(filepath)
-        except Exception as e:
-            print(f"⚠️ [PDF] Ошибка чтения с UTF-8, пробуем другие кодировки...")
-            # Пробуем другие кодировки для CSV
-            if filename.endswith('.csv'):
-                try:
-                    print("📊 [PDF] Пробуем кодировку cp1251...")
-                    df = pd.read_csv(filepath, encoding='cp1251')
-                except:
-                    try:
-                        print("📊 [PDF] Пробуем кодировку latin-1...")
-                        df = pd.read_csv(filepath, encoding='latin-1')
-                    except:
-                        print(f"❌ [PDF] Критическая ошибка чтения файла: {str(e)}")
-                        return jsonify({'error': f'Ошибка чтения файла: {str(e)}'}), 500
-            else:
-                print(f"❌ [PDF] Критическая ошибка чтения файла: {str(e)}")
-                return jsonify({'error': f'Ошибка чтения файла: {str(e)}'}), 500
+        logger.debug("✅ [PDF] Файл найден: %s", filepath)
         
-        print(f"📈 [PDF] Данные загружены: {len(df)} строк, {len(df.columns)} столбцов")
+        # PDF создаётся в фоновой задаче, клиент получает её идентификатор
+        # и опрашивает /analysis_status, пока отчёт не будет готов
+        job_id = submit_analysis_job(
+            _run_pdf_generation, filepath, filename, yandex_analysis, gigachat_analysis, report_data
+        )
+        logger.debug("⏳ [PDF] Генерация PDF поставлена в очередь: %s", job_id)
+        return jsonify({'success': True, 'status': 'pending', 'job_id': job_id}), 202
         
-        # Очищаем данные
-        print("🧹 [PDF] Очищаем данные...")
-        df = df.dropna(how='all')
-        df = df.dropna(axis=1, how='all')
-        df = df.where(pd.notnull(df), None)
-        df = df.replace(['', ' ', '  ', '   '], None)  # Заменяем пустые строки на None
-        df = df.replace(['nan', 'NaN', 'NAN'], None)  # Заменяем строковые 'nan' на None
-        
-        print(f"✨ [PDF] Данные очищены: {len(df)} строк, {len(df.columns)} столбцов")
-        
-        # Получаем аналитику
-        print("📊 [PDF] Генерируем аналитику...")
-        data_types = detect_data_types(df)
-        analytics = get_basic_analytics(df)
-        print(f"✅ [PDF] Аналитика готова: {len(analytics)} элементов")
+    except Exception as e:
+        logger.error(f"Ошибка запуска генерации PDF: {e}")
+        return jsonify({'error': f'Ошибка генерации PDF: {str(e)}'}), 500
+
+def _run_pdf_generation(filepath, filename, yandex_analysis, gigachat_analysis, report_data=None):
+    """
+    Создаёт PDF отчёт в фоновой задаче, возвращает ответ и HTTP код
+    
+    report_data - столбцы, число строк, аналитика и первые строки таблицы
+    из ответа /upload. Если их нет, файл читается и аналитика считается заново.
+    """
+    try:
+        if report_data is not None:
+            logger.debug("📊 [PDF] Используем данные, полученные при загрузке файла")
+            columns = report_data['columns']
+            total_rows = report_data['total_rows']
+            analytics = report_data['analytics']
+            table_data = report_data['table_data'][:PDF_TABLE_ROWS]
+        else:
+            # Читаем и очищаем файл через общий кэш, как и остальные маршруты
+            logger.debug("📊 [PDF] Загружаем данные файла...")
+            stat = os.stat(filepath)
+            df, data_types = load_dataframe(filepath, stat)
+            
+            logger.debug("📈 [PDF] Данные загружены: %s строк, %s столбцов", len(df), len(df.columns))
+            columns = list(df.columns)
+            total_rows = len(df)
+            
+            # Аналитика уже посчитана при загрузке файла и берётся из кэша
+            logger.debug("📊 [PDF] Генерируем аналитику...")
+            analytics = load_analytics(filepath, stat)
+            
+            # Подготавливаем данные для PDF
+            table_data = dataframe_to_records(df.head(PDF_TABLE_ROWS))
         
-        # Подготавливаем данные для PDF
-        df_sample = df.head(50)  # Берем больше строк для PDF
-        df_sample_clean = convert_dataframe_to_json_safe(df_sample)
-        table_data = df_sample_clean.to_dict('records')
-        print(f"📋 [PDF] Подготовлено {len(table_data)} строк для таблицы в PDF")
+        logger.debug("✅ [PDF] Аналитика готова: %s элементов", len(analytics))
+        logger.debug("📋 [PDF] Подготовлено %s строк для таблицы в PDF", len(table_data))
         
         # Получаем AI анализы если есть
         ai_analyses = {}
         if yandex_analysis and yandex_analysis != 'Здесь появится вывод от нейросети':
             ai_analyses['yandex'] = yandex_analysis
-            print(f"🤖 [PDF] Яндекс.GPT анализ включён в PDF: {len(yandex_analysis)} символов")
+            logger.debug("🤖 [PDF] Яндекс.GPT анализ включён в PDF: %s символов", len(yandex_analysis))
         if gigachat_analysis and gigachat_analysis != 'Здесь появится вывод от нейросети':
             ai_analyses['gigachat'] = gigachat_analysis
-            print(f"🤖 [PDF] GigaChat анализ включён в PDF: {len(gigachat_analysis)} символов")
+            logger.debug("🤖 [PDF] GigaChat анализ включён в PDF: %s символов", len(gigachat_analysis))
         
         if not ai_analyses:
-            print("🤖 [PDF] AI анализы не включены в PDF")
+            logger.debug("🤖 [PDF] AI анализы не включены в PDF")
         
         # Подготавливаем данные для PDF генератора
         pdf_data = {
             'filename': filename,
-            'total_rows': len(df),
-            'total_columns': len(df.columns),
-            'columns': list(df.columns),
+            'total_rows': total_rows,
+            'total_columns': len(columns),
+            'columns': columns,
             'table_data': table_data,
             'analytics': analytics,
             'ai_analyses': ai_analyses
         }
         
-        # Создаем временный файл для PDF
+        # Создаем временный файл для PDF; суффикс не даёт отчётам,
+        # созданным в одну секунду, перезаписать друг друга
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        pdf_filename = f"analytics_report_{timestamp}.pdf"
+        pdf_filename = f"analytics_report_{timestamp}_{uuid.uuid4().hex[:8]}.pdf"
         pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], pdf_filename)
         
-        print(f"📄 [PDF] Создаём PDF файл: {pdf_filename}")
-        print(f"📁 [PDF] Путь сохранения: {pdf_path}")
+        logger.debug("📄 [PDF] Создаём PDF файл: %s", pdf_filename)
+        logger.debug("📁 [PDF] Путь сохранения: %s", pdf_path)
         
-        # Генерируем PDF
-        print("🔄 [PDF] Запускаем генерацию PDF...")
-        success = create_pdf_report(pdf_data, pdf_path)
+        # Генерируем PDF во временный файл и переименовываем его, когда он
+        # готов: до этого /download_pdf отвечает 404, а не отдаёт часть файла
+        logger.debug("🔄 [PDF] Запускаем генерацию PDF...")
+        temp_pdf_path = pdf_path + '.tmp'
+        success = create_pdf_report(pdf_data, temp_pdf_path)
+        if success:
+            os.replace(temp_pdf_path, pdf_path)
+        elif os.path.exists(temp_pdf_path):
+            os.remove(temp_pdf_path)
         
         if success:
             file_size = os.path.getsize(pdf_path)
-            print(f"✅ [PDF] PDF отчёт успешно создан!")
-            print(f"📊 [PDF] Размер файла: {file_size} байт")
-            print(f"📄 [PDF] Имя файла: {pdf_filename}")
-            return jsonify({
+            logger.debug("✅ [PDF] PDF отчёт успешно создан!")
+            logger.debug("📊 [PDF] Размер файла: %s байт", file_size)
+            logger.debug("📄 [PDF] Имя файла: %s", pdf_filename)
+            return {
                 'success': True,
                 'pdf_filename': pdf_filename,
                 'message': 'PDF отчет успешно создан'
-            })
+            }, 200
         else:
-            print("❌ [PDF] Ошибка создания PDF отчёта")
-            return jsonify({
+            logger.debug("❌ [PDF] Ошибка создания PDF отчёта")
+            return {
                 'success': False,
                 'error': 'Ошибка создания PDF отчета'
-            }), 500
+            }, 500
         
     except Exception as e:
-        print(f"❌ [PDF] Критическая ошибка: {str(e)}")
-        import traceback
-        print(f"🔍 [PDF] Трассировка ошибки:\n{traceback.format_exc()}")
+        logger.debug("❌ [PDF] Критическая ошибка: %s", e)
+        logger.debug("🔍 [PDF] Трассировка ошибки", exc_info=True)
         logger.error(f"Ошибка генерации PDF: {e}")
-        return jsonify({'error': f'Ошибка генерации PDF: {str(e)}'}), 500
+        return {'error': f'Ошибка генерации PDF: {str(e)}'}, 500
 
 @app.route('/download_pdf/<filename>')
 def download_pdf(filename):
     """Скачивание PDF файла"""
     try:
-        print(f"📥 [DOWNLOAD] Запрос на скачивание PDF: {filename}")
+        logger.debug("📥 [DOWNLOAD] Запрос на скачивание PDF: %s", filename)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         
-        if os.path.exists(filepath):
-            file_size = os.path.getsize(filepath)
-            print(f"✅ [DOWNLOAD] PDF файл найден: {filepath}")
-            print(f"📊 [DOWNLOAD] Размер файла: {file_size} байт")
-            print(f"📤 [DOWNLOAD] Отправляем файл клиенту...")
+        stat = stat_file(filepath)
+        if stat is not None:
+            file_size = stat.st_size
+            logger.debug("✅ [DOWNLOAD] PDF файл найден: %s", filepath)
+            logger.debug("📊 [DOWNLOAD] Размер файла: %s байт", file_size)
+            logger.debug("📤 [DOWNLOAD] Отправляем файл клиенту...")
             
-            response = send_file(filepath, as_attachment=True, download_name=filename)
-            print(f"✅ [DOWNLOAD] Файл успешно отправлен клиенту")
+            # conditional=True включает ETag, If-Modified-Since и Range:
+            # повторное скачивание и докачка не передают файл заново
+            response = send_file(
+                filepath,
+                mimetype='application/pdf',
+                as_attachment=True,
+                download_name=filename,
+                conditional=True,
+                etag=True,
+                max_age=0
+            )
+            logger.debug("✅ [DOWNLOAD] Файл успешно отправлен клиенту")
             return response
         else:
-            print(f"❌ [DOWNLOAD] PDF файл не найден: {filepath}")
+            logger.debug("❌ [DOWNLOAD] PDF файл не найден: %s", filepath)
             return jsonify({'error': 'PDF файл не найден'}), 404
     except Exception as e:
-        print(f"❌ [DOWNLOAD] Ошибка скачивания PDF: {str(e)}")
-        import traceback
-        print(f"🔍 [DOWNLOAD] Трассировка ошибки:\n{traceback.format_exc()}")
+        logger.debug("❌ [DOWNLOAD] Ошибка скачивания PDF: %s", e)
+        logger.debug("🔍 [DOWNLOAD] Трассировка ошибки", exc_info=True)
         logger.error(f"Ошибка скачивания PDF: {e}")
         return jsonify({'error': f'Ошибка скачивания: {str(e)}'}), 500
 
@@ -64,7 +64,7 @@ echo "   - Перейдите на https://render.com"
 echo "   - New + → Web Service"
 echo "   - Подключите GitHub репозиторий"
 echo "   - Build Command: pip install -r requirements.txt"
-echo "   - Start Command: gunicorn app:app"
+echo "   - Start Command: gunicorn --worker-class gthread --workers 1 --threads 16 --timeout 120 app:app"
 echo "   - Добавьте переменные окружения из .env"
 echo ""
 echo "3. 🔄 Запустите деплой:"
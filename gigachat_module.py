@@ -4,19 +4,35 @@
 """
 
 import os
+import time
 import logging
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Union
+import pandas as pd
 from dotenv import load_dotenv
 
 logger = logging.getLogger(__name__)
 
+# Переменные окружения читаем один раз при импорте модуля
+load_dotenv()
+
+# Корневой сертификат для проверки SSL соединения с GigaChat
+CA_BUNDLE_PATH = os.path.join(os.path.dirname(__file__), "russian_trusted_root_ca.cer")
+
+# Токен доступа обновляется в фоне: за сколько секунд до истечения
+# его обновлять и через сколько секунд повторить неудачную попытку
+TOKEN_REFRESH_MARGIN = 30
+TOKEN_REFRESH_RETRY = 10
+
+# Общий экземпляр анализатора, создаётся при первом обращении
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
 class GigaChatAnalyzer:
     """Класс для анализа данных с помощью GigaChat"""
     
     def __init__(self):
         """Инициализация анализатора GigaChat"""
-        load_dotenv()
-        
         self.api_key = os.getenv('GIGACHAT_API_KEY')
         if not self.api_key:
             raise ValueError(
@@ -29,13 +45,11 @@ class GigaChatAnalyzer:
             from gigachat import GigaChat
             
             # Используем сертификат через ca_bundle_file
-            cert_path = os.path.join(os.path.dirname(__file__), "russian_trusted_root_ca.cer")
-            
-            if os.path.exists(cert_path):
+            if os.path.exists(CA_BUNDLE_PATH):
                 self.client = GigaChat(
                     credentials=self.api_key,
                     verify_ssl_certs=True,
-                    ca_bundle_file=cert_path
+                    ca_bundle_file=CA_BUNDLE_PATH
                 )
             else:
                 # Если сертификат не найден, отключаем проверку SSL
@@ -48,13 +62,55 @@ class GigaChatAnalyzer:
         except Exception as e:
             logger.error(f"Ошибка инициализации GigaChat: {e}")
             raise
+        
+        # Токен получаем сразу, чтобы первый запрос не ждал авторизации
+        self.token_expires_at = None
+        self._refresh_token()
     
-    def analyze_table_data(self, table_data: List[Dict], filename: str) -> Dict[str, Any]:
+    def _refresh_token(self):
+        """
+        Получает токен доступа и планирует его обновление до истечения срока
+        
+        Ошибка получения токена не прерывает работу: клиент сам авторизуется
+        при запросе, а фоновая попытка повторится через TOKEN_REFRESH_RETRY секунд.
+        """
+        delay = TOKEN_REFRESH_RETRY
+        try:
+            token = self.client.get_token()
+            if token is None or not token.expires_at:
+                # Авторизация не требуется или токен бессрочный
+                return
+            self.token_expires_at = token.expires_at / 1000
+            delay = max(self.token_expires_at - time.time() - TOKEN_REFRESH_MARGIN, TOKEN_REFRESH_RETRY)
+        except Exception as e:
+            logger.warning(f"Не удалось получить токен GigaChat: {e}")
+        
+        timer = threading.Timer(delay, self._refresh_token)
+        timer.daemon = True
+        timer.start()
+    
+    @staticmethod
+    def _format_table(table_data: Union[List[Dict], pd.DataFrame]) -> str:
+        """
+        Форматирует таблицу для промпта в виде CSV с разделителем |
+        
+        Args:
+            table_data: DataFrame или список словарей с данными таблицы
+            
+        Returns:
+            Текст таблицы с заголовком из названий столбцов
+        """
+        df = table_data if isinstance(table_data, pd.DataFrame) else pd.DataFrame(table_data)
+        df = df.astype(object)
+        df = df.mask(df.isna() | (df == ''), 'пусто')
+        return df.to_csv(sep='|', index=False)
+    
+    def analyze_table_data(self, table_data: Union[List[Dict], pd.DataFrame], filename: str) -> Dict[str, Any]:
         """
         Анализирует табличные данные с помощью GigaChat
         
         Args:
-            table_data: Список словарей с данными таблицы (первые 15 строк)
+            table_data: DataFrame или список словарей с данными таблицы (первые 15 строк)
             filename: Имя файла для контекста
             
         Returns:
@@ -69,22 +125,11 @@ class GigaChatAnalyzer:
             )
             
             # Подготавливаем данные для промпта
-            data_text = f"Вот первые 15 строк таблицы из файла {filename}:\n\n"
+            data_text = f"Вот первые 15 строк таблицы из файла {filename} (значения разделены символом |):\n\n"
             
-            if table_data:
-                # Получаем названия столбцов
-                columns = list(table_data[0].keys()) if table_data else []
-                data_text += f"Столбцы: {', '.join(columns)}\n\n"
-                
-                # Добавляем данные
-                for i, row in enumerate(table_data, 1):
-                    data_text += f"Строка {i}: "
-                    row_values = []
-                    for col, value in row.items():
-                        if value is None or value == '':
-                            value = 'пусто'
-                        row_values.append(f"{col}={value}")
-                    data_text += ", ".join(row_values) + "\n"
+            if len(table_data) > 0:
+                # Таблицу целиком форматирует pandas, а не цикл по строкам
+                data_text += self._format_table(table_data)
             else:
                 data_text += "Данные отсутствуют"
             
@@ -127,16 +172,24 @@ class GigaChatAnalyzer:
 
 def create_gigachat_analyzer():
     """
-    Создает экземпляр анализатора GigaChat
+    Возвращает общий экземпляр анализатора GigaChat
+    
+    Анализатор создаётся при первом вызове и переиспользуется, чтобы не
+    создавать клиент и не получать токен заново на каждый запрос. Если
+    создать анализатор не удалось, следующий вызов попробует снова.
     
     Returns:
         GigaChatAnalyzer или None в случае ошибки
     """
-    try:
-        return GigaChatAnalyzer()
-    except Exception as e:
-        logger.error(f"Не удалось создать анализатор GigaChat: {e}")
-        return None
+    global _analyzer
+    with _analyzer_lock:
+        if _analyzer is None:
+            try:
+                _analyzer = GigaChatAnalyzer()
+            except Exception as e:
+                logger.error(f"Не удалось создать анализатор GigaChat: {e}")
+                return None
+        return _analyzer
 
 if __name__ == "__main__":
     # Тестирование модуля
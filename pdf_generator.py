@@ -6,15 +6,16 @@
 
 import os
 import io
+import functools
 import math
 import logging
 import re
+import threading
 from datetime import datetime
 from typing import Dict, List, Any, Optional
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Используем non-interactive backend
+from pandas.api.types import infer_dtype, is_bool_dtype, is_float_dtype, is_integer_dtype
 
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -22,12 +23,138 @@ from reportlab.lib.units import mm
 from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, PageBreak
 from reportlab.platypus.flowables import HRFlowable
+from reportlab.graphics.shapes import Drawing, Group, String
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.linecharts import HorizontalLineChart
+from reportlab.graphics.widgets.markers import makeMarker
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
 
 logger = logging.getLogger(__name__)
 
+# Разметка Markdown внутри строки: жирный и курсивный текст
+BOLD_PATTERN = re.compile(r'\*\*(.*?)\*\*')
+ITALIC_PATTERN = re.compile(r'\*(.*?)\*')
+
+# Имя, под которым регистрируется шрифт с кириллицей
+CUSTOM_FONT_NAME = 'CustomFont'
+
+# Системные шрифты с кириллицей в порядке предпочтения
+if os.name == 'nt':
+    # Для Windows
+    FONT_PATHS = (
+        'C:/Windows/Fonts/arial.ttf',
+        'C:/Windows/Fonts/calibri.ttf',
+        'C:/Windows/Fonts/times.ttf'
+    )
+else:
+    # Для Linux
+    FONT_PATHS = (
+        '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+        '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
+        '/System/Library/Fonts/Arial.ttf'  # macOS
+    )
+
+# Размер диаграммы в отчете: ширина страницы A4 без полей, пропорции 10x6
+CHART_WIDTH = 170 * mm
+CHART_HEIGHT = CHART_WIDTH * 0.6
+# Отступы области построения внутри диаграммы: слева под подписи оси Y,
+# снизу под подписи категорий и оси X, сверху под заголовок
+CHART_PADDING_LEFT = 55
+CHART_PADDING_RIGHT = 10
+CHART_PADDING_BOTTOM = 45
+CHART_PADDING_TOP = 30
+# Число категорий, после которого подписи оси X поворачиваются
+CHART_ROTATE_LABELS_AFTER = 8
+
+# Общий генератор отчётов: шрифт и стили настраиваются один раз на процесс
+_generator = None
+_generator_lock = threading.Lock()
+
+# Таблица данных в отчёте: число строк, длина значения ячейки
+# и обозначение пустого значения
+TABLE_MAX_ROWS = 30
+TABLE_MAX_CELL_LENGTH = 25
+EMPTY_CELL = '—'
+
+# Цвета оформления отчета: основной и фон строк таблицы данных
+PRIMARY_COLOR = colors.HexColor('#1e3a8a')
+TABLE_ROW_COLOR = colors.HexColor('#fefce8')
+TABLE_ALT_ROW_COLOR = colors.HexColor('#f7fee7')
+
+# Разделы AI анализа в порядке вывода: ключ в ai_analyses и заголовок
+AI_ANALYSIS_TITLES = (
+    ('yandex', '🔵 Яндекс.GPT'),
+    ('gigachat', '🟢 GigaChat'),
+)
+
+# Тип строки Markdown: заголовок, горизонтальная линия или элемент списка.
+# Порядок альтернатив задаёт приоритет, например ### проверяется раньше #
+MARKDOWN_LINE_PATTERN = re.compile(
+    r'(?P<h3>###)|(?P<h2>##)|(?P<h1>#)|(?P<rule>---|\*\*\*)'
+    r'|(?P<bullet>[-*] )|(?P<numbered>[0-9]+\. )'
+)
+
+@functools.lru_cache(maxsize=1)
+def _register_custom_font() -> Optional[str]:
+    """
+    Регистрирует первый доступный шрифт из FONT_PATHS один раз на процесс
+    
+    Returns:
+        Имя зарегистрированного шрифта или None, если ни один не подошёл
+    """
+    # Шрифт уже зарегистрирован в этом процессе - повторно TTF не читаем
+    if CUSTOM_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return CUSTOM_FONT_NAME
+    
+    for font_path in FONT_PATHS:
+        if os.path.exists(font_path):
+            try:
+                pdfmetrics.registerFont(TTFont(CUSTOM_FONT_NAME, font_path))
+                logger.info(f"Зарегистрирован шрифт: {font_path}")
+                return CUSTOM_FONT_NAME
+            except Exception as e:
+                logger.warning(f"Не удалось зарегистрировать шрифт {font_path}: {e}")
+    return None
+
+def _format_table_cell(value: Any) -> str:
+    """Форматирует значение ячейки таблицы данных"""
+    # Обрабатываем пустые значения и NaN
+    if value is None or (isinstance(value, float) and math.isnan(value)) or str(value).strip() == '':
+        return EMPTY_CELL
+    # Ограничиваем длину значения
+    if isinstance(value, str):
+        return value if len(value) <= TABLE_MAX_CELL_LENGTH else value[:TABLE_MAX_CELL_LENGTH - 3] + '...'
+    if isinstance(value, float) and math.isfinite(value):
+        return f"{value:.2f}" if value != int(value) else str(int(value))
+    return str(value)
+
+def _format_table_column(column: pd.Series) -> pd.Series:
+    """
+    Форматирует столбец таблицы данных так же, как _format_table_cell
+    
+    Числовые и строковые столбцы обрабатываются векторно,
+    столбцы со смешанными значениями - по ячейкам.
+    """
+    if is_bool_dtype(column) or is_integer_dtype(column):
+        return column.astype(str)
+    
+    if is_float_dtype(column):
+        values = column.to_numpy(dtype=float)
+        # Целые значения выводим без дробной части
+        whole = np.isfinite(values) & (values == np.trunc(values))
+        formatted = np.where(whole, np.char.mod('%d', np.where(whole, values, 0)), np.char.mod('%.2f', values))
+        return pd.Series(np.where(np.isnan(values), EMPTY_CELL, formatted), index=column.index, dtype=object)
+    
+    if infer_dtype(column, skipna=True) == 'string':
+        text = column.fillna('')
+        blank = text.str.strip() == ''
+        text = text.where(text.str.len() <= TABLE_MAX_CELL_LENGTH, text.str[:TABLE_MAX_CELL_LENGTH - 3] + '...')
+        return text.mask(blank, EMPTY_CELL)
+    
+    return column.map(_format_table_cell)
+
 class PDFReportGenerator:
     """Класс для генерации PDF отчетов"""
     
@@ -36,46 +163,61 @@ class PDFReportGenerator:
         self.styles = getSampleStyleSheet()
         self._setup_fonts()
         self._setup_custom_styles()
+        self._setup_table_style()
+        
+        # Обработчики строк Markdown по имени группы MARKDOWN_LINE_PATTERN
+        self._markdown_handlers = {
+            'h1': self._markdown_h1,
+            'h2': self._markdown_h2,
+            'h3': self._markdown_h3,
+            'rule': self._markdown_rule,
+            'bullet': self._markdown_bullet,
+            'numbered': self._markdown_numbered,
+        }
+    
+    def _setup_table_style(self):
+        """Стиль таблицы данных, одинаковый для всех отчетов"""
+        self._data_table_style = TableStyle([
+            # Заголовки
+            ('BACKGROUND', (0, 0), (-1, 0), PRIMARY_COLOR),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), self.font_name),
+            ('FONTSIZE', (0, 0), (-1, 0), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+            ('TOPPADDING', (0, 0), (-1, 0), 8),
+            
+            # Данные
+            ('BACKGROUND', (0, 1), (-1, -1), TABLE_ROW_COLOR),  # Светло-желтый фон
+            ('FONTNAME', (0, 1), (-1, -1), self.font_name),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('ALIGN', (0, 1), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('TOPPADDING', (0, 1), (-1, -1), 4),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 4),
+            ('LEFTPADDING', (0, 0), (-1, -1), 6),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+            
+            # Границы
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+            ('LINEBELOW', (0, 0), (-1, 0), 2, colors.black),
+            
+            # Альтернативные строки
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [TABLE_ROW_COLOR, TABLE_ALT_ROW_COLOR])
+        ])
     
     def _setup_fonts(self):
         """Настройка шрифтов для поддержки русского языка"""
         try:
-            # Пытаемся зарегистрировать системные шрифты
-            # Для Windows
-            if os.name == 'nt':
-                font_paths = [
-                    'C:/Windows/Fonts/arial.ttf',
-                    'C:/Windows/Fonts/calibri.ttf',
-                    'C:/Windows/Fonts/times.ttf'
-                ]
-            # Для Linux
-            else:
-                font_paths = [
-                    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
-                    '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
-                    '/System/Library/Fonts/Arial.ttf'  # macOS
-                ]
-            
-            # Регистрируем первый доступный шрифт
-            for font_path in font_paths:
-                if os.path.exists(font_path):
-                    try:
-                        pdfmetrics.registerFont(TTFont('CustomFont', font_path))
-                        self.font_name = 'CustomFont'
-                        logger.info(f"Зарегистрирован шрифт: {font_path}")
-                        break
-                    except Exception as e:
-                        logger.warning(f"Не удалось зарегистрировать шрифт {font_path}: {e}")
-                        continue
-            
-            # Если не удалось зарегистрировать кастомный шрифт, используем стандартный
-            if not hasattr(self, 'font_name'):
-                self.font_name = 'Helvetica'
-                logger.warning("Используется стандартный шрифт Helvetica (возможны проблемы с кириллицей)")
-                
+            self.font_name = _register_custom_font()
         except Exception as e:
             logger.error(f"Ошибка настройки шрифтов: {e}")
+            self.font_name = None
+        
+        # Если не удалось зарегистрировать кастомный шрифт, используем стандартный
+        if not self.font_name:
             self.font_name = 'Helvetica'
+            logger.warning("Используется стандартный шрифт Helvetica (возможны проблемы с кириллицей)")
     
     def _setup_custom_styles(self):
         """Настройка пользовательских стилей"""
@@ -131,6 +273,45 @@ class PDFReportGenerator:
             rightIndent=10
         ))
     
+    @staticmethod
+    def _format_inline(text: str) -> str:
+        """Заменяет жирный и курсивный текст Markdown на теги ReportLab"""
+        text = BOLD_PATTERN.sub(r'<b>\1</b>', text)
+        return ITALIC_PATTERN.sub(r'<i>\1</i>', text)
+    
+    def _markdown_heading(self, text: str, font_size: Optional[int], space: int) -> List:
+        """Заголовок Markdown: жирный текст заданного размера и отступ после него"""
+        if font_size:
+            text = f"<font size='{font_size}'>{text}</font>"
+        return [Paragraph(f"<b>{text}</b>", self.styles['AIAnalysis']), Spacer(1, space)]
+    
+    def _markdown_h1(self, line: str, match) -> List:
+        """Заголовок 1-го уровня"""
+        return self._markdown_heading(line[match.end():].strip(), 14, 8)
+    
+    def _markdown_h2(self, line: str, match) -> List:
+        """Заголовок 2-го уровня"""
+        return self._markdown_heading(line[match.end():].strip(), 12, 6)
+    
+    def _markdown_h3(self, line: str, match) -> List:
+        """Заголовок 3-го уровня"""
+        return self._markdown_heading(line[match.end():].strip(), None, 4)
+    
+    def _markdown_rule(self, line: str, match) -> List:
+        """Горизонтальная линия"""
+        return [HRFlowable(width="100%", thickness=1, lineCap='round', color=colors.grey), Spacer(1, 6)]
+    
+    def _markdown_bullet(self, line: str, match) -> List:
+        """Элемент маркированного списка"""
+        list_item = self._format_inline(line[match.end():].strip())
+        return [Paragraph(f"• {list_item}", self.styles['AIAnalysis']), Spacer(1, 2)]
+    
+    def _markdown_numbered(self, line: str, match) -> List:
+        """Элемент нумерованного списка"""
+        number = line[:match.end()].rstrip()
+        list_item = self._format_inline(line[match.end():].strip())
+        return [Paragraph(f"{number} {list_item}", self.styles['AIAnalysis']), Spacer(1, 2)]
+    
     def _convert_markdown_to_reportlab(self, text: str) -> List:
         """
         Конвертирует Markdown текст в элементы ReportLab
@@ -146,115 +327,108 @@ class PDFReportGenerator:
         if not text or not text.strip():
             return elements
         
-        # Разбиваем текст на строки
-        lines = text.split('\n')
-        current_paragraph = []
+        # Строки текущего абзаца накапливаются в одном буфере через пробел
+        current_paragraph = io.StringIO()
+        
+        def flush_paragraph():
+            """Добавляет накопленный абзац с обработкой жирного и курсивного текста"""
+            paragraph_text = current_paragraph.getvalue().rstrip()
+            if paragraph_text:
+                paragraph_text = self._format_inline(paragraph_text)
+                # Spacer создаётся заново: ReportLab помечает перенесённые на
+                # следующую страницу элементы, и общий экземпляр вызывает LayoutError
+                elements.extend((Paragraph(paragraph_text, self.styles['AIAnalysis']), Spacer(1, 4)))
+                current_paragraph.seek(0)
+                current_paragraph.truncate()
         
-        for line in lines:
+        for line in text.split('\n'):
             line = line.strip()
             
-            # Обрабатываем заголовки
-            if line.startswith('###'):
-                # Заголовок 3-го уровня
-                if current_paragraph:
-                    elements.append(Paragraph(' '.join(current_paragraph), self.styles['AIAnalysis']))
-                    elements.append(Spacer(1, 4))
-                    current_paragraph = []
-                
-                header_text = line[3:].strip()
-                elements.append(Paragraph(f"<b>{header_text}</b>", self.styles['AIAnalysis']))
-                elements.append(Spacer(1, 4))
-                
-            elif line.startswith('##'):
-                # Заголовок 2-го уровня
-                if current_paragraph:
-                    elements.append(Paragraph(' '.join(current_paragraph), self.styles['AIAnalysis']))
-                    elements.append(Spacer(1, 4))
-                    current_paragraph = []
-                
-                header_text = line[2:].strip()
-                elements.append(Paragraph(f"<b><font size='12'>{header_text}</font></b>", self.styles['AIAnalysis']))
-                elements.append(Spacer(1, 6))
-                
-            elif line.startswith('#'):
-                # Заголовок 1-го уровня
-                if current_paragraph:
-                    elements.append(Paragraph(' '.join(current_paragraph), self.styles['AIAnalysis']))
-                    elements.append(Spacer(1, 4))
-                    current_paragraph = []
-                
-                header_text = line[1:].strip()
-                elements.append(Paragraph(f"<b><font size='14'>{header_text}</font></b>", self.styles['AIAnalysis']))
-                elements.append(Spacer(1, 8))
-                
-            elif line.startswith('---') or line.startswith('***'):
-                # Горизонтальная линия
-                if current_paragraph:
-                    elements.append(Paragraph(' '.join(current_paragraph), self.styles['AIAnalysis']))
-                    elements.append(Spacer(1, 4))
-                    current_paragraph = []
-                
-                elements.append(HRFlowable(width="100%", thickness=1, lineCap='round', color=colors.grey))
-                elements.append(Spacer(1, 6))
-                
-            elif line.startswith('- ') or line.startswith('* '):
-                # Список
-                if current_paragraph:
-                    elements.append(Paragraph(' '.join(current_paragraph), self.styles['AIAnalysis']))
-                    elements.append(Spacer(1, 4))
-                    current_paragraph = []
-                
-                list_item = line[2:].strip()
-                # Обрабатываем жирный текст в списке
-                list_item = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', list_item)
-                list_item = re.sub(r'\*(.*?)\*', r'<i>\1</i>', list_item)
-                elements.append(Paragraph(f"• {list_item}", self.styles['AIAnalysis']))
-                elements.append(Spacer(1, 2))
-                
-            elif line.startswith('1. ') or line.startswith('2. ') or line.startswith('3. ') or line.startswith('4. ') or line.startswith('5. '):
-                # Нумерованный список
-                if current_paragraph:
-                    elements.append(Paragraph(' '.join(current_paragraph), self.styles['AIAnalysis']))
-                    elements.append(Spacer(1, 4))
-                    current_paragraph = []
-                
-                list_item = line[3:].strip()
-                # Обрабатываем жирный текст в списке
-                list_item = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', list_item)
-                list_item = re.sub(r'\*(.*?)\*', r'<i>\1</i>', list_item)
-                elements.append(Paragraph(f"{line[:2]} {list_item}", self.styles['AIAnalysis']))
-                elements.append(Spacer(1, 2))
-                
+            # Заголовки, линии и элементы списков определяются одним совпадением
+            match = MARKDOWN_LINE_PATTERN.match(line)
+            if match:
+                flush_paragraph()
+                elements.extend(self._markdown_handlers[match.lastgroup](line, match))
             elif line == '':
                 # Пустая строка - завершаем текущий абзац
-                if current_paragraph:
-                    paragraph_text = ' '.join(current_paragraph)
-                    # Обрабатываем жирный и курсивный текст
-                    paragraph_text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', paragraph_text)
-                    paragraph_text = re.sub(r'\*(.*?)\*', r'<i>\1</i>', paragraph_text)
-                    elements.append(Paragraph(paragraph_text, self.styles['AIAnalysis']))
-                    elements.append(Spacer(1, 4))
-                    current_paragraph = []
-                
+                flush_paragraph()
             else:
                 # Обычный текст
-                current_paragraph.append(line)
+                current_paragraph.write(line)
+                current_paragraph.write(' ')
         
         # Обрабатываем последний абзац
-        if current_paragraph:
-            paragraph_text = ' '.join(current_paragraph)
-            # Обрабатываем жирный и курсивный текст
-            paragraph_text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', paragraph_text)
-            paragraph_text = re.sub(r'\*(.*?)\*', r'<i>\1</i>', paragraph_text)
-            elements.append(Paragraph(paragraph_text, self.styles['AIAnalysis']))
-            elements.append(Spacer(1, 4))
+        flush_paragraph()
         
         return elements
     
+    def render_to_bytes(self, data: Dict[str, Any]) -> bytes:
+        """
+        Строит PDF отчет в памяти
+        
+        Args:
+            data: Словарь с данными для отчета
+            
+        Returns:
+            Содержимое PDF файла
+        """
+        # Создаем PDF документ
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=A4,
+            rightMargin=20*mm,
+            leftMargin=20*mm,
+            topMargin=20*mm,
+            bottomMargin=20*mm
+        )
+        
+        # Список элементов для добавления в PDF
+        story = []
+        
+        # Заголовок отчета
+        story.append(Paragraph("📊 Аналитический отчет", self.styles['ReportTitle']))
+        
+        # Информация о файле и дате
+        file_info = f"<b>Файл:</b> {data.get('filename', 'Не указан')}<br/>"
+        file_info += f"<b>Дата создания:</b> {datetime.now().strftime('%d.%m.%Y %H:%M')}<br/>"
+        file_info += f"<b>Всего строк:</b> {data.get('total_rows', 0):,}<br/>"
+        file_info += f"<b>Всего столбцов:</b> {data.get('total_columns', 0)}"
+        
+        # Добавляем информацию о заполненности данных
+        if data.get('analytics', {}).get('summary_stats', {}).get('completeness_percentage'):
+            completeness = data['analytics']['summary_stats']['completeness_percentage']
+            file_info += f"<br/><b>Заполненность данных:</b> {completeness}%"
+        
+        story.extend((
+            Paragraph(file_info, self.styles['NormalText']),
+            Spacer(1, 15),
+            HRFlowable(width="100%", thickness=2, lineCap='round', color=PRIMARY_COLOR),
+            Spacer(1, 15),
+        ))
+        
+        # Добавляем таблицу данных
+        if data.get('table_data'):
+            story.extend(self._add_data_table(data['table_data'], data.get('columns', [])))
+        
+        # Добавляем аналитику
+        if data.get('analytics'):
+            story.extend(self._add_analytics_section(data['analytics']))
+        
+        # Добавляем AI анализы
+        if data.get('ai_analyses'):
+            story.extend(self._add_ai_analysis_section(data['ai_analyses']))
+        
+        # Строим PDF
+        doc.build(story)
+        return buffer.getvalue()
+    
     def generate_report(self, data: Dict[str, Any], output_path: str) -> bool:
         """
         Генерирует PDF отчет
         
+        Отчет строится в памяти и записывается в файл одной операцией.
+        
         Args:
             data: Словарь с данными для отчета
             output_path: Путь для сохранения PDF файла
@@ -263,52 +437,9 @@ class PDFReportGenerator:
             True если отчет создан успешно, False иначе
         """
         try:
-            # Создаем PDF документ
-            doc = SimpleDocTemplate(
-                output_path,
-                pagesize=A4,
-                rightMargin=20*mm,
-                leftMargin=20*mm,
-                topMargin=20*mm,
-                bottomMargin=20*mm
-            )
-            
-            # Список элементов для добавления в PDF
-            story = []
-            
-            # Заголовок отчета
-            story.append(Paragraph("📊 Аналитический отчет", self.styles['ReportTitle']))
-            
-            # Информация о файле и дате
-            file_info = f"<b>Файл:</b> {data.get('filename', 'Не указан')}<br/>"
-            file_info += f"<b>Дата создания:</b> {datetime.now().strftime('%d.%m.%Y %H:%M')}<br/>"
-            file_info += f"<b>Всего строк:</b> {data.get('total_rows', 0):,}<br/>"
-            file_info += f"<b>Всего столбцов:</b> {data.get('total_columns', 0)}"
-            
-            # Добавляем информацию о заполненности данных
-            if data.get('analytics', {}).get('summary_stats', {}).get('completeness_percentage'):
-                completeness = data['analytics']['summary_stats']['completeness_percentage']
-                file_info += f"<br/><b>Заполненность данных:</b> {completeness}%"
-            
-            story.append(Paragraph(file_info, self.styles['NormalText']))
-            story.append(Spacer(1, 15))
-            story.append(HRFlowable(width="100%", thickness=2, lineCap='round', color=colors.HexColor('#1e3a8a')))
-            story.append(Spacer(1, 15))
-            
-            # Добавляем таблицу данных
-            if data.get('table_data'):
-                story.extend(self._add_data_table(data['table_data'], data.get('columns', [])))
-            
-            # Добавляем аналитику
-            if data.get('analytics'):
-                story.extend(self._add_analytics_section(data['analytics']))
-            
-            # Добавляем AI анализы
-            if data.get('ai_analyses'):
-                story.extend(self._add_ai_analysis_section(data['ai_analyses']))
-            
-            # Строим PDF
-            doc.build(story)
+            pdf_bytes = self.render_to_bytes(data)
+            with open(output_path, 'wb') as f:
+                f.write(pdf_bytes)
             logger.info(f"PDF отчет успешно создан: {output_path}")
             return True
             
@@ -326,71 +457,20 @@ class PDFReportGenerator:
             elements.append(Paragraph("Данные отсутствуют", self.styles['NormalText']))
             return elements
         
-        # Подготавливаем данные для таблицы (первые 30 строк)
-        table_rows = [columns]  # Заголовки
-        
-        for row in table_data[:30]:  # Увеличиваем количество строк
-            table_row = []
-            for col in columns:
-                value = row.get(col, '')
-                
-                # Обрабатываем пустые значения и NaN
-                if (value is None or value == '' or str(value).strip() == '' or 
-                    (isinstance(value, float) and math.isnan(value))):
-                    value = '—'  # Используем тире для пустых значений
-                else:
-                    # Ограничиваем длину значения
-                    if isinstance(value, str) and len(value) > 25:
-                        value = value[:22] + '...'
-                    elif isinstance(value, (int, float)):
-                        # Форматируем числа, проверяем на NaN
-                        if isinstance(value, float):
-                            if math.isnan(value):
-                                value = '—'  # Заменяем NaN на тире
-                            else:
-                                value = f"{value:.2f}" if value != int(value) else str(int(value))
-                        else:
-                            value = str(value)
-                
-                table_row.append(str(value))
-            table_rows.append(table_row)
+        # Подготавливаем данные для таблицы (первые 30 строк): значения
+        # форматируются целыми столбцами, а не по одной ячейке
+        df = pd.DataFrame(table_data[:TABLE_MAX_ROWS]).reindex(columns=columns)
+        formatted = df.apply(_format_table_column)
+        table_rows = [columns] + formatted.values.tolist()  # Заголовки и данные
         
         # Создаем таблицу с улучшенным форматированием
         table = Table(table_rows, repeatRows=1)
-        table.setStyle(TableStyle([
-            # Заголовки
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3a8a')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), self.font_name),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-            ('TOPPADDING', (0, 0), (-1, 0), 8),
-            
-            # Данные
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#fefce8')),  # Светло-желтый фон
-            ('FONTNAME', (0, 1), (-1, -1), self.font_name),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('ALIGN', (0, 1), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 1), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 4),
-            ('LEFTPADDING', (0, 0), (-1, -1), 6),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-            
-            # Границы
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('LINEBELOW', (0, 0), (-1, 0), 2, colors.black),
-            
-            # Альтернативные строки
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.HexColor('#fefce8'), colors.HexColor('#f7fee7')])
-        ]))
+        table.setStyle(self._data_table_style)
         
-        elements.append(table)
-        elements.append(Spacer(1, 12))
+        elements.extend((table, Spacer(1, 12)))
         
-        if len(table_data) > 30:
-            elements.append(Paragraph(f"<i>Показаны первые 30 строк из {len(table_data)}</i>", self.styles['NormalText']))
+        if len(table_data) > TABLE_MAX_ROWS:
+            elements.append(Paragraph(f"<i>Показаны первые {TABLE_MAX_ROWS} строк из {len(table_data)}</i>", self.styles['NormalText']))
         
         return elements
     
@@ -411,8 +491,7 @@ class PDFReportGenerator:
             • Текстовые столбцы: {summary.get('text_columns', 0)}<br/>
             • Заполненность: {summary.get('completeness_percentage', 0)}%
             """
-            elements.append(Paragraph(stats_text, self.styles['NormalText']))
-            elements.append(Spacer(1, 12))
+            elements.extend((Paragraph(stats_text, self.styles['NormalText']), Spacer(1, 12)))
         
         # Информация по столбцам
         columns_info = analytics.get('columns_info', {})
@@ -436,80 +515,104 @@ class PDFReportGenerator:
         elements.append(Paragraph("🤖 Анализ от нейросетей", self.styles['SectionTitle']))
         
         if ai_analyses:
-            # Добавляем анализ от Яндекс.GPT если есть
-            if 'yandex' in ai_analyses and ai_analyses['yandex'].strip():
-                elements.append(Paragraph("🔵 Яндекс.GPT", self.styles['SubsectionTitle']))
-                elements.append(Spacer(1, 4))
-                
-                # Конвертируем Markdown в ReportLab элементы
-                markdown_elements = self._convert_markdown_to_reportlab(ai_analyses['yandex'])
-                elements.extend(markdown_elements)
-                
-                elements.append(Spacer(1, 8))
-            
-            # Добавляем анализ от GigaChat если есть
-            if 'gigachat' in ai_analyses and ai_analyses['gigachat'].strip():
-                elements.append(Paragraph("🟢 GigaChat", self.styles['SubsectionTitle']))
-                elements.append(Spacer(1, 4))
+            for key, title in AI_ANALYSIS_TITLES:
+                analysis = ai_analyses.get(key)
+                if not analysis or not analysis.strip():
+                    continue
                 
+                elements.extend((Paragraph(title, self.styles['SubsectionTitle']), Spacer(1, 4)))
                 # Конвертируем Markdown в ReportLab элементы
-                markdown_elements = self._convert_markdown_to_reportlab(ai_analyses['gigachat'])
-                elements.extend(markdown_elements)
-                
+                elements.extend(self._convert_markdown_to_reportlab(analysis))
                 elements.append(Spacer(1, 8))
         else:
             elements.append(Paragraph("AI анализы не были выполнены", self.styles['NormalText']))
         
         return elements
     
-    def create_chart_image(self, chart_data: Dict, chart_type: str) -> Optional[str]:
+    def create_chart(self, chart_data: Dict, chart_type: str) -> Optional[Drawing]:
         """
-        Создает изображение диаграммы
+        Создает диаграмму для вставки в отчет
+        
+        Диаграмма строится средствами ReportLab и попадает в PDF векторной
+        графикой, без растрового изображения и matplotlib.
         
         Args:
             chart_data: Данные для диаграммы
             chart_type: Тип диаграммы
             
         Returns:
-            Путь к созданному изображению или None
+            Диаграмма ReportLab (Drawing) или None
         """
         try:
-            # Создаем временный файл для изображения
-            temp_path = f"temp_chart_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-            
-            # Настраиваем matplotlib для русского языка
-            plt.rcParams['font.family'] = ['DejaVu Sans', 'Arial', 'sans-serif']
-            plt.rcParams['axes.unicode_minus'] = False
-            
-            fig, ax = plt.subplots(figsize=(10, 6))
+            drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
             
-            if chart_type == 'bar' and 'x' in chart_data and 'y' in chart_data:
-                ax.bar(chart_data['x'], chart_data['y'], color='#1e3a8a')
-                ax.set_title(chart_data.get('title', 'Диаграмма'), fontsize=14)
-                ax.set_xlabel(chart_data.get('xlabel', 'X'), fontsize=12)
-                ax.set_ylabel(chart_data.get('ylabel', 'Y'), fontsize=12)
+            if chart_type in ('bar', 'line') and 'x' in chart_data and 'y' in chart_data:
+                if chart_type == 'bar':
+                    chart = VerticalBarChart()
+                    chart.bars[0].fillColor = PRIMARY_COLOR
+                    chart.bars[0].strokeColor = None
+                else:
+                    chart = HorizontalLineChart()
+                    chart.lines[0].strokeColor = PRIMARY_COLOR
+                    chart.lines[0].strokeWidth = 2
+                    chart.lines[0].symbol = makeMarker('FilledCircle', fillColor=PRIMARY_COLOR)
+                
+                chart.x = CHART_PADDING_LEFT
+                chart.y = CHART_PADDING_BOTTOM
+                chart.width = CHART_WIDTH - CHART_PADDING_LEFT - CHART_PADDING_RIGHT
+                chart.height = CHART_HEIGHT - CHART_PADDING_BOTTOM - CHART_PADDING_TOP
+                chart.data = [[float(value) for value in chart_data['y']]]
+                chart.categoryAxis.categoryNames = [str(name) for name in chart_data['x']]
+                chart.categoryAxis.labels.fontName = self.font_name
+                chart.categoryAxis.labels.fontSize = 8
+                chart.valueAxis.labels.fontName = self.font_name
+                chart.valueAxis.labels.fontSize = 8
+                chart.valueAxis.valueMin = min(0, *chart.data[0]) if chart.data[0] else 0
+                if len(chart_data['x']) > CHART_ROTATE_LABELS_AFTER:
+                    chart.categoryAxis.labels.angle = 30
+                    chart.categoryAxis.labels.boxAnchor = 'ne'
+                drawing.add(chart)
                 
-            elif chart_type == 'line' and 'x' in chart_data and 'y' in chart_data:
-                ax.plot(chart_data['x'], chart_data['y'], marker='o', linewidth=2, color='#1e3a8a')
-                ax.set_title(chart_data.get('title', 'Диаграмма'), fontsize=14)
-                ax.set_xlabel(chart_data.get('xlabel', 'X'), fontsize=12)
-                ax.set_ylabel(chart_data.get('ylabel', 'Y'), fontsize=12)
+                # Подписи осей
+                drawing.add(String(
+                    CHART_PADDING_LEFT + chart.width / 2, 4, chart_data.get('xlabel', 'X'),
+                    fontName=self.font_name, fontSize=10, textAnchor='middle'
+                ))
+                ylabel = Group(String(
+                    0, 0, chart_data.get('ylabel', 'Y'),
+                    fontName=self.font_name, fontSize=10, textAnchor='middle'
+                ))
+                ylabel.translate(10, CHART_PADDING_BOTTOM + chart.height / 2)
+                ylabel.rotate(90)
+                drawing.add(ylabel)
             
-            plt.tight_layout()
-            plt.savefig(temp_path, dpi=150, bbox_inches='tight')
-            plt.close()
+            drawing.add(String(
+                CHART_WIDTH / 2, CHART_HEIGHT - 16, chart_data.get('title', 'Диаграмма'),
+                fontName=self.font_name, fontSize=12, textAnchor='middle'
+            ))
             
-            return temp_path
+            return drawing
             
         except Exception as e:
-            logger.error(f"Ошибка создания изображения диаграммы: {e}")
+            logger.error(f"Ошибка создания диаграммы: {e}")
             return None
 
+def _get_generator() -> PDFReportGenerator:
+    """Возвращает общий генератор отчётов, создавая его при первом вызове"""
+    global _generator
+    with _generator_lock:
+        if _generator is None:
+            _generator = PDFReportGenerator()
+        return _generator
+
 
 def create_pdf_report(data: Dict[str, Any], output_path: str) -> bool:
     """
     Создает PDF отчет
     
+    Генератор создаётся один раз: регистрация шрифта читает весь TTF файл,
+    а стили не меняются между отчётами.
+    
     Args:
         data: Данные для отчета
         output_path: Путь для сохранения
@@ -517,8 +620,7 @@ def create_pdf_report(data: Dict[str, Any], output_path: str) -> bool:
     Returns:
         True если успешно, False иначе
     """
-    generator = PDFReportGenerator()
-    return generator.generate_report(data, output_path)
+    return _get_generator().generate_report(data, output_path)
 
 
 # Пример использования
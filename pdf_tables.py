@@ -0,0 +1,110 @@
+"""
+Извлечение таблиц из PDF файлов и очистка данных
+
+Модуль зависит только от pdfplumber и pandas: функция extract_table_from_pdf
+выполняется в пуле процессов, и дочерний процесс импортирует только этот
+модуль, а не всё Flask приложение.
+"""
+
+import logging
+import pandas as pd
+from pandas.api.types import is_object_dtype
+import pdfplumber
+
+logger = logging.getLogger(__name__)
+
+# Доля распознанных значений, при которой
+# текстовый столбец считается числовым или датой
+TYPE_DETECTION_THRESHOLD = 0.8
+
+# Значения текстовых столбцов, которые считаются пустыми
+EMPTY_VALUE_PATTERN = r'^\s*(nan|NaN|NAN)?\s*$'
+
+def to_datetime_mixed(values, errors='coerce'):
+    """Преобразует значения в даты, определяя формат каждого значения отдельно"""
+    return pd.to_datetime(values, errors=errors, format='mixed')
+
+def clean_dataframe(df):
+    """Удаляет пустые строки и столбцы и приводит пустые значения к None"""
+    # Маску пропусков строим один раз и по ней сразу удаляем
+    # полностью пустые строки и столбцы
+    missing = df.isna().to_numpy()
+    empty_rows = missing.all(axis=1)
+    empty_columns = missing.all(axis=0)
+    if empty_rows.any() or empty_columns.any():
+        df = df.iloc[~empty_rows, ~empty_columns]
+    
+    # Пустые строки и строковые 'nan' встречаются только в текстовых столбцах,
+    # поэтому заменяем их на None одним проходом по этим столбцам.
+    # NaN в остальных столбцах обрабатывает JSON преобразование.
+    # Столбцы заменяются в поверхностной копии: исходный DataFrame
+    # не изменяется, а срез iloc не вызывает SettingWithCopyWarning
+    text_positions = [i for i, dtype in enumerate(df.dtypes) if is_object_dtype(dtype)]
+    if text_positions:
+        cleaned = df.iloc[:, text_positions].replace(EMPTY_VALUE_PATTERN, None, regex=True)
+        df = df.copy(deep=False)
+        df.isetitem(text_positions, cleaned)
+    
+    return df
+
+def extract_table_from_pdf(filepath):
+    """Извлекает первую таблицу из PDF файла"""
+    try:
+        with pdfplumber.open(filepath) as pdf:
+            if len(pdf.pages) == 0:
+                raise ValueError("PDF файл не содержит страниц")
+            
+            # Ищем таблицы на первой странице, но извлекаем содержимое
+            # только первой из них
+            first_page = pdf.pages[0]
+            found_tables = first_page.find_tables()
+            
+            if not found_tables:
+                raise ValueError("На первой странице PDF не найдено таблиц")
+            
+            # Берем первую найденную таблицу
+            table = found_tables[0].extract()
+            
+            if not table or len(table) == 0:
+                raise ValueError("Первая таблица в PDF пуста")
+            
+            # Преобразуем таблицу в DataFrame
+            # Первая строка - заголовки
+            if len(table) < 2:
+                raise ValueError("Таблица должна содержать как минимум заголовки и одну строку данных")
+            
+            headers = table[0]
+            data_rows = table[1:]
+            
+            # Создаем DataFrame
+            df = pd.DataFrame(data_rows, columns=headers)
+            
+            # Очищаем данные: пустые ячейки таблицы заменяем на None
+            # и удаляем полностью пустые строки и столбцы
+            df = clean_dataframe(df)
+            
+            # Автоматически определяем типы данных для каждого столбца
+            for column in df.columns:
+                try:
+                    # Пытаемся преобразовать в числовой тип
+                    numeric = pd.to_numeric(df[column], errors='coerce')
+                    if numeric.notna().mean() > TYPE_DETECTION_THRESHOLD:
+                        df[column] = numeric
+                        # Числовой столбец в дату уже не преобразуем
+                        continue
+                except:
+                    pass
+                
+                # Пытаемся преобразовать в дату только нечисловые столбцы
+                try:
+                    dates = to_datetime_mixed(df[column])
+                    if dates.notna().mean() > TYPE_DETECTION_THRESHOLD:
+                        df[column] = dates
+                except:
+                    pass
+            
+            return df
+            
+    except Exception as e:
+        logger.error(f"Ошибка извлечения таблицы из PDF: {e}")
+        raise e
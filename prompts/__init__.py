@@ -1,17 +1,35 @@
 import os
+import functools
+
+PROMPTS_DIR = os.path.dirname(__file__)
+
+@functools.lru_cache(maxsize=4)
+def _read_prompts(directory: str, mtime_ns: int) -> dict:
+    """Читает все .txt промпты каталога за один проход, кэш сбрасывается при изменении каталога"""
+    prompts = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.txt') or not entry.is_file():
+                continue
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    prompts[entry.name] = f.read().strip()
+            except Exception as e:
+                print(f"Ошибка загрузки промпта {entry.name}: {e}")
+    return prompts
 
 def load_prompt(filename: str) -> str:
     """Загружает промпт из файла"""
-    prompt_path = os.path.join(os.path.dirname(__file__), filename)
+    prompt_path = os.path.join(PROMPTS_DIR, filename)
     try:
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            return f.read().strip()
-    except FileNotFoundError:
-        print(f"Файл промпта не найден: {prompt_path}")
-        return ""
+        prompts = _read_prompts(PROMPTS_DIR, os.stat(PROMPTS_DIR).st_mtime_ns)
     except Exception as e:
         print(f"Ошибка загрузки промпта {filename}: {e}")
         return ""
+    if filename not in prompts:
+        print(f"Файл промпта не найден: {prompt_path}")
+        return ""
+    return prompts[filename]
 
 # Загружаем промпты при импорте модуля
 GIGACHAT_SYSTEM_PROMPT = load_prompt("gigachat_system_prompt.txt")
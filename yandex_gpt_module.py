@@ -6,12 +6,165 @@
 
 import os
 import time
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
-from yandex_cloud_ml_sdk import YCloudML
+import json
+import threading
+from typing import TYPE_CHECKING, Callable, List, Dict, Any, Optional, Union, Iterable, Iterator, Tuple
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from yandex_cloud_ml_sdk import YCloudML
 
 logger = logging.getLogger(__name__)
 
+# Сколько запросов analyze_many одновременно держит в работе
+MAX_CONCURRENT_REQUESTS = 4
+
+# Значения таблицы в промпте: предельная длина значения, минимальная длина,
+# до которой значения укорачиваются, и бюджет на все строки данных в символах
+# (около 2000 токенов), чтобы широкие таблицы не раздували запрос
+PROMPT_CELL_MAX_LENGTH = 50
+PROMPT_CELL_MIN_LENGTH = 10
+PROMPT_DATA_MAX_CHARS = 6000
+
+# Опрос отложенной операции: первая пауза, рост паузы, её предел и общий
+# лимит ожидания в секундах. SDK по умолчанию опрашивает раз в 10 секунд
+POLL_INITIAL_DELAY = 0.25
+POLL_BACKOFF = 1.5
+POLL_MAX_DELAY = 5.0
+POLL_TIMEOUT = 600
+
+# Размыкатель цепи: после стольких ошибок API подряд запросы не отправляются
+# CIRCUIT_RESET_TIMEOUT секунд, затем пропускается один пробный запрос. Если
+# о его результате не сообщили за CIRCUIT_TRIAL_TIMEOUT секунд, пропускается
+# следующий. Повторы отдельных вызовов при UNAVAILABLE и RESOURCE_EXHAUSTED
+# с экспоненциальной паузой SDK выполняет сам
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 30
+CIRCUIT_TRIAL_TIMEOUT = POLL_TIMEOUT
+
+# Прогрев соединения: сообщение для токенизации и лимит ожидания ответа в секундах
+PREWARM_MESSAGES = [{"role": "user", "text": "Проверка соединения"}]
+PREWARM_TIMEOUT = 30
+
+CIRCUIT_OPEN_ERROR = 'Яндекс.GPT временно недоступен: несколько запросов подряд завершились ошибкой. Повторите попытку позже'
+
+# Системный промпт анализа таблицы
+SYSTEM_PROMPT = """Ты - аналитическая система с большим опытом. Твоя задача - анализировать табличные данные, делать выводы и находить аномалии или интересные тенденции.
+
+Проанализируй предоставленные данные и дай развернутый ответ, включающий:
+1. Общую характеристику данных
+2. Выявленные паттерны и тренды
+3. Аномалии или необычные значения
+4. Практические выводы и рекомендации
+5. Потенциальные области для дальнейшего исследования
+
+Отвечай на русском языке, структурированно и профессионально."""
+
+SYSTEM_MESSAGE = {"role": "system", "text": SYSTEM_PROMPT}
+
+# Пользовательский промпт, подставляются имя файла и строки таблицы
+USER_PROMPT_TEMPLATE = """Вот первые 15 строк таблицы из файла "{filename}":
+
+{data_text}
+
+Пожалуйста, проанализируй эти данные и дай развернутый аналитический отчет."""
+
+# Пакетный анализ: сколько таблиц отправляется одним запросом, блок одной
+# таблицы и пользовательский промпт. Ответ запрашивается в формате JSON
+BATCH_MAX_TABLES = 5
+BATCH_TABLE_TEMPLATE = """<table name="{filename}">
+{data_text}
+</table>"""
+BATCH_USER_PROMPT_TEMPLATE = """Ниже {count} таблиц из разных файлов, для каждой указано имя файла (первые 15 строк):
+
+{tables}
+
+Проанализируй каждую таблицу отдельно и дай по ней развернутый аналитический отчет.
+Ответь JSON объектом, в котором ключ - имя файла, а значение - текст отчета по этой таблице."""
+
+# Клиенты SDK по паре (каталог, токен), общие для всех анализаторов процесса
+_sdk_clients = {}
+_sdk_lock = threading.Lock()
+
+# Общий экземпляр анализатора, создаётся при первом обращении
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+class _CircuitBreaker:
+    """Размыкатель цепи для запросов к API"""
+    
+    def __init__(self, failure_threshold: int, reset_timeout: float, trial_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.trial_timeout = trial_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """Можно ли отправить запрос"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if self._trial_in_flight:
+                # Пробный запрос ещё выполняется - остальные ждут его результата
+                if now - self._opened_at < self.trial_timeout:
+                    return False
+            elif now - self._opened_at < self.reset_timeout:
+                return False
+            # Пропускаем один пробный запрос, цепь остаётся разомкнутой до его результата
+            self._opened_at = now
+            self._trial_in_flight = True
+            return True
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight:
+                # Пробный запрос не удался - пауза начинается заново
+                self._trial_in_flight = False
+                self._opened_at = time.monotonic()
+            elif self._failures >= self.failure_threshold and self._opened_at is None:
+                self._opened_at = time.monotonic()
+                logger.warning(
+                    f"Яндекс.GPT: {self._failures} ошибок подряд, запросы приостановлены на {self.reset_timeout} с"
+                )
+
+# Состояние API общее для всех анализаторов процесса
+_circuit = _CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, CIRCUIT_TRIAL_TIMEOUT)
+
+
+def _get_sdk(folder_id: str, auth_token: str) -> 'YCloudML':
+    """
+    Возвращает клиент SDK для пары каталог/токен, создавая его при первом вызове
+    
+    Клиент держит gRPC соединение и цикл событий, поэтому создаётся один раз
+    на процесс, даже если анализаторов несколько. Сам SDK (grpc, protobuf)
+    импортируется здесь же: это занимает около полсекунды, а процессу без
+    запросов к Яндекс.GPT он не нужен.
+    """
+    key = (folder_id, auth_token)
+    with _sdk_lock:
+        sdk = _sdk_clients.get(key)
+        if sdk is None:
+            from yandex_cloud_ml_sdk import YCloudML
+            
+            sdk = _sdk_clients[key] = YCloudML(folder_id=folder_id, auth=auth_token)
+            logger.info("Яндекс.GPT SDK успешно инициализирован")
+        return sdk
+
+
 class YandexGPTAnalyzer:
     """Класс для анализа данных с помощью Яндекс.GPT"""
     
@@ -27,144 +180,435 @@ class YandexGPTAnalyzer:
             )
         
         try:
-            self.sdk = YCloudML(
-                folder_id=self.folder_id,
-                auth=self.auth_token,
-            )
+            self.sdk = _get_sdk(self.folder_id, self.auth_token)
             self.model = self.sdk.models.completions("yandexgpt")
-            logger.info("Яндекс.GPT SDK успешно инициализирован")
+            # Настроенные копии модели создаются один раз, а не на каждый запрос
+            self.analysis_model = self.model.configure(temperature=0.3)
+            self.test_model = self.model.configure(temperature=0.1)
+            self.batch_model = self.model.configure(temperature=0.3, response_format='json')
+            self.circuit = _circuit
         except Exception as e:
             logger.error(f"Ошибка инициализации Яндекс.GPT SDK: {e}")
             raise e
     
-    def analyze_table_data(self, table_data: List[Dict[str, Any]], filename: str = "") -> Dict[str, Any]:
+    def analyze_table_data(self, table_data: Union[List[Dict[str, Any]], pd.DataFrame], filename: str = "",
+                           on_progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """
         Анализирует табличные данные с помощью Яндекс.GPT
         
         Args:
-            table_data: Список словарей с данными таблицы (первые 15 строк)
+            table_data: DataFrame или список словарей с данными таблицы (первые 15 строк)
             filename: Имя файла для контекста
+            on_progress: Если указана, ответ читается потоком и функция получает
+                весь текст, сгенерированный к этому моменту
             
         Returns:
             Словарь с результатами анализа
         """
+        if on_progress is not None:
+            return self._analyze_streamed(table_data, filename, on_progress)
+        
         try:
-            # Подготавливаем данные для анализа
-            data_text = self._prepare_data_for_analysis(table_data)
+            messages = self._build_messages(table_data, filename)
             
-            # Формируем системный промпт
-            system_prompt = """Ты - аналитическая система с большим опытом. Твоя задача - анализировать табличные данные, делать выводы и находить аномалии или интересные тенденции.
-
-Проанализируй предоставленные данные и дай развернутый ответ, включающий:
-1. Общую характеристику данных
-2. Выявленные паттерны и тренды
-3. Аномалии или необычные значения
-4. Практические выводы и рекомендации
-5. Потенциальные области для дальнейшего исследования
-
-Отвечай на русском языке, структурированно и профессионально."""
-
-            # Формируем пользовательский промпт
-            user_prompt = f"""Вот первые 15 строк таблицы из файла "{filename}":
-
-{data_text}
-
-Пожалуйста, проанализируй эти данные и дай развернутый аналитический отчет."""
-
-            # Создаем сообщения для API
-            messages = [
-                {
-                    "role": "system",
-                    "text": system_prompt
-                },
-                {
-                    "role": "user", 
-                    "text": user_prompt
-                }
-            ]
+            if not self.circuit.allow():
+                return {'success': False, 'error': CIRCUIT_OPEN_ERROR}
             
             logger.info(f"Отправляем запрос в Яндекс.GPT для анализа файла: {filename}")
             
-            # Отправляем запрос с использованием deferred метода
-            operation = self.model.configure(temperature=0.3).run_deferred(messages)
-            
-            # Ждем завершения операции
-            result = operation.wait()
+            try:
+                # Отправляем запрос с использованием deferred метода
+                operation = self.analysis_model.run_deferred(messages)
+                
+                # Ждем завершения операции
+                result = self._wait_operation(operation)
+            except Exception:
+                self.circuit.record_failure()
+                raise
+            self.circuit.record_success()
             
-            if result and hasattr(result, 'alternatives') and result.alternatives:
-                # Получаем текст из альтернативы
-                alternative = result.alternatives[0]
-                if hasattr(alternative, 'message') and hasattr(alternative.message, 'text'):
-                    analysis_text = alternative.message.text
-                elif hasattr(alternative, 'text'):
-                    analysis_text = alternative.text
-                else:
-                    # Пробуем получить текст напрямую из альтернативы
-                    analysis_text = str(alternative)
+            return self._parse_result(result, filename)
                 
-                logger.info("Анализ от Яндекс.GPT получен успешно")
+        except Exception as e:
+            logger.error(f"Ошибка анализа данных через Яндекс.GPT: {e}")
+            return {
+                'success': False,
+                'error': f'Ошибка анализа: {str(e)}'
+            }
+    
+    def analyze_table_data_stream(self, table_data: Union[List[Dict[str, Any]], pd.DataFrame], filename: str = "") -> Iterator[str]:
+        """
+        Анализирует табличные данные, отдавая текст по мере генерации
+        
+        В отличие от analyze_table_data ответ не ждёт окончания генерации:
+        первые фрагменты доступны сразу. Ошибки API и разомкнутая цепь
+        пробрасываются вызывающему как исключения.
+        
+        Args:
+            table_data: DataFrame или список словарей с данными таблицы
+            filename: Имя файла для контекста
+            
+        Yields:
+            Новые фрагменты текста анализа
+        """
+        messages = self._build_messages(table_data, filename)
+        
+        if not self.circuit.allow():
+            raise RuntimeError(CIRCUIT_OPEN_ERROR)
+        
+        logger.info(f"Отправляем потоковый запрос в Яндекс.GPT для анализа файла: {filename}")
+        
+        received = ''
+        try:
+            for result in self.analysis_model.run_stream(messages):
+                if not result.alternatives:
+                    continue
+                # Каждый фрагмент потока содержит весь текст, полученный к этому моменту
+                text = result.alternatives[0].text
+                if len(text) > len(received):
+                    yield text[len(received):]
+                    received = text
+        except Exception:
+            self.circuit.record_failure()
+            raise
+        self.circuit.record_success()
+    
+    def _analyze_streamed(self, table_data: Union[List[Dict[str, Any]], pd.DataFrame], filename: str,
+                          on_progress: Callable[[str], None]) -> Dict[str, Any]:
+        """Анализирует таблицу через поток ответа, сообщая в on_progress уже полученный текст"""
+        analysis_text = ''
+        try:
+            for part in self.analyze_table_data_stream(table_data, filename):
+                analysis_text += part
+                on_progress(analysis_text)
+        except Exception as e:
+            logger.error(f"Ошибка анализа данных через Яндекс.GPT: {e}")
+            return {
+                'success': False,
+                'error': f'Ошибка анализа: {str(e)}'
+            }
+        
+        if not analysis_text:
+            logger.error("Получен пустой ответ от Яндекс.GPT")
+            return {
+                'success': False,
+                'error': 'Получен пустой ответ от нейросети'
+            }
+        
+        logger.info("Анализ от Яндекс.GPT получен успешно")
+        
+        return {
+            'success': True,
+            'analysis': analysis_text,
+            'model': 'yandexgpt',
+            'filename': filename
+        }
+    
+    async def analyze_table_data_async(self, table_data: Union[List[Dict[str, Any]], pd.DataFrame], filename: str = "") -> Dict[str, Any]:
+        """
+        Асинхронная версия analyze_table_data
+        
+        Подготовка промпта и вызовы SDK выполняются в отдельных потоках,
+        а паузы между опросами операции - в цикле событий, поэтому один
+        поток может вести много запросов одновременно.
+        
+        Args:
+            table_data: DataFrame или список словарей с данными таблицы
+            filename: Имя файла для контекста
+            
+        Returns:
+            Словарь с результатами анализа
+        """
+        try:
+            # Подготовка таблицы на pandas тоже выполняется в потоке, чтобы не
+            # задерживать цикл событий, ведущий другие запросы
+            messages = await asyncio.to_thread(self._build_messages, table_data, filename)
+            
+            if not self.circuit.allow():
+                return {'success': False, 'error': CIRCUIT_OPEN_ERROR}
+            
+            logger.info(f"Отправляем запрос в Яндекс.GPT для анализа файла: {filename}")
+            
+            try:
+                operation = await asyncio.to_thread(self.analysis_model.run_deferred, messages)
+                result = await self._await_operation(operation)
+            except Exception:
+                self.circuit.record_failure()
+                raise
+            self.circuit.record_success()
+            
+            return self._parse_result(result, filename)
                 
-                return {
+        except Exception as e:
+            logger.error(f"Ошибка анализа данных через Яндекс.GPT: {e}")
+            return {
+                'success': False,
+                'error': f'Ошибка анализа: {str(e)}'
+            }
+    
+    def analyze_tables_batched(self, tables: Iterable[Tuple[Union[List[Dict[str, Any]], pd.DataFrame], str]],
+                               max_tables: int = BATCH_MAX_TABLES) -> List[Dict[str, Any]]:
+        """
+        Анализирует несколько небольших таблиц, объединяя их в общие запросы
+        
+        До max_tables таблиц отправляются одним запросом с общим системным
+        промптом, модель отвечает JSON объектом с отчетом по каждому файлу.
+        Если ответ не удалось разобрать, таблицы пакета анализируются по одной.
+        
+        Args:
+            tables: Пары (данные таблицы, имя файла)
+            max_tables: Максимальное число таблиц в одном запросе
+            
+        Returns:
+            Результаты анализа в порядке входных таблиц
+        """
+        tables = list(tables)
+        results = []
+        for start in range(0, len(tables), max_tables):
+            results.extend(self._analyze_batch(tables[start:start + max_tables]))
+        return results
+    
+    def _analyze_batch(self, batch: List[Tuple[Union[List[Dict[str, Any]], pd.DataFrame], str]]) -> List[Dict[str, Any]]:
+        """Анализирует один пакет таблиц, возвращает результаты по каждой"""
+        filenames = [filename for _, filename in batch]
+        # Одна таблица или повторяющиеся имена файлов - объединять нечего или нельзя
+        if len(batch) == 1 or len(set(filenames)) < len(filenames):
+            return [self.analyze_table_data(table_data, filename) for table_data, filename in batch]
+        
+        try:
+            tables_text = "\n\n".join(
+                BATCH_TABLE_TEMPLATE.format_map({
+                    'filename': filename,
+                    'data_text': self._prepare_data_for_analysis(table_data)
+                })
+                for table_data, filename in batch
+            )
+            user_prompt = BATCH_USER_PROMPT_TEMPLATE.format_map({'count': len(batch), 'tables': tables_text})
+            
+            if not self.circuit.allow():
+                return [{'success': False, 'error': CIRCUIT_OPEN_ERROR} for _ in batch]
+            
+            logger.info(f"Отправляем в Яндекс.GPT пакетный запрос для {len(batch)} файлов")
+            
+            try:
+                operation = self.batch_model.run_deferred([SYSTEM_MESSAGE, {"role": "user", "text": user_prompt}])
+                result = self._wait_operation(operation)
+            except Exception:
+                self.circuit.record_failure()
+                raise
+            self.circuit.record_success()
+            
+            response = self._parse_result(result, '')
+            if not response['success']:
+                raise ValueError(response['error'])
+            analyses = json.loads(response['analysis'])
+            
+            results = []
+            for filename in filenames:
+                analysis_text = analyses[filename]
+                if not isinstance(analysis_text, str):
+                    raise ValueError(f'Отчет по файлу {filename} не является текстом')
+                results.append({
                     'success': True,
                     'analysis': analysis_text,
                     'model': 'yandexgpt',
                     'filename': filename
-                }
-            else:
-                logger.error("Получен пустой ответ от Яндекс.GPT")
-                return {
-                    'success': False,
-                    'error': 'Получен пустой ответ от нейросети'
-                }
-                
+                })
+            return results
+            
         except Exception as e:
-            logger.error(f"Ошибка анализа данных через Яндекс.GPT: {e}")
+            logger.warning(f"Пакетный анализ не удался, анализируем таблицы по одной: {e}")
+            return [self.analyze_table_data(table_data, filename) for table_data, filename in batch]
+    
+    @staticmethod
+    def _wait_operation(operation):
+        """
+        Ждёт завершения отложенной операции, опрашивая её с растущей паузой
+        
+        Короткие ответы забираются через доли секунды, а не через
+        интервал опроса SDK по умолчанию.
+        
+        Returns:
+            Результат операции
+        """
+        deadline = time.monotonic() + POLL_TIMEOUT
+        delay = POLL_INITIAL_DELAY
+        while operation.get_status().is_running:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f'Операция не завершилась за {POLL_TIMEOUT} секунд')
+            time.sleep(delay)
+            delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+        return operation.get_result()
+    
+    @staticmethod
+    async def _await_operation(operation):
+        """Асинхронная версия _wait_operation"""
+        deadline = time.monotonic() + POLL_TIMEOUT
+        delay = POLL_INITIAL_DELAY
+        while (await asyncio.to_thread(operation.get_status)).is_running:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f'Операция не завершилась за {POLL_TIMEOUT} секунд')
+            await asyncio.sleep(delay)
+            delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+        return await asyncio.to_thread(operation.get_result)
+    
+    def _build_messages(self, table_data: Union[List[Dict[str, Any]], pd.DataFrame], filename: str) -> List[Dict[str, str]]:
+        """
+        Формирует сообщения запроса к Яндекс.GPT
+        
+        Args:
+            table_data: DataFrame или список словарей с данными таблицы
+            filename: Имя файла для контекста
+            
+        Returns:
+            Список сообщений для API
+        """
+        # Подготавливаем данные для анализа
+        data_text = self._prepare_data_for_analysis(table_data)
+        
+        # Системное сообщение общее для всех запросов, SDK его только читает
+        user_prompt = USER_PROMPT_TEMPLATE.format_map({'filename': filename, 'data_text': data_text})
+        return [SYSTEM_MESSAGE, {"role": "user", "text": user_prompt}]
+    
+    def _parse_result(self, result, filename: str) -> Dict[str, Any]:
+        """
+        Извлекает текст анализа из результата операции
+        
+        Args:
+            result: Результат отложенной операции
+            filename: Имя файла для контекста
+            
+        Returns:
+            Словарь с результатами анализа
+        """
+        try:
+            alternative = result.alternatives[0]
+        except (AttributeError, IndexError, TypeError):
+            logger.error("Получен пустой ответ от Яндекс.GPT")
             return {
                 'success': False,
-                'error': f'Ошибка анализа: {str(e)}'
+                'error': 'Получен пустой ответ от нейросети'
             }
+        
+        # Получаем текст из альтернативы: в текущем SDK он лежит в text,
+        # в старых версиях - в message.text
+        try:
+            analysis_text = alternative.text
+        except AttributeError:
+            try:
+                analysis_text = alternative.message.text
+            except AttributeError:
+                # Пробуем получить текст напрямую из альтернативы
+                analysis_text = str(alternative)
+        
+        logger.info("Анализ от Яндекс.GPT получен успешно")
+        
+        return {
+            'success': True,
+            'analysis': analysis_text,
+            'model': 'yandexgpt',
+            'filename': filename
+        }
+    
+    async def analyze_many(self, tables: Iterable[Tuple[Union[List[Dict[str, Any]], pd.DataFrame], str]],
+                           max_concurrency: int = MAX_CONCURRENT_REQUESTS) -> List[Dict[str, Any]]:
+        """
+        Анализирует несколько таблиц параллельно
+        
+        Запросы к API выполняются одновременно, но не больше max_concurrency
+        за раз, так что общее время близко к времени самых медленных ответов,
+        а не к их сумме.
+        
+        Args:
+            tables: Пары (данные таблицы, имя файла)
+            max_concurrency: Максимальное число одновременных запросов
+            
+        Returns:
+            Результаты анализа в порядке входных таблиц
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def analyze(table_data, filename):
+            async with semaphore:
+                return await self.analyze_table_data_async(table_data, filename)
+        
+        return await asyncio.gather(*(analyze(table_data, filename) for table_data, filename in tables))
     
-    def _prepare_data_for_analysis(self, table_data: List[Dict[str, Any]]) -> str:
+    def _prepare_data_for_analysis(self, table_data: Union[List[Dict[str, Any]], pd.DataFrame]) -> str:
         """
         Подготавливает данные таблицы для отправки в нейросеть
         
         Args:
-            table_data: Список словарей с данными
+            table_data: DataFrame или список словарей с данными
             
         Returns:
             Отформатированная строка с данными
         """
-        if not table_data:
+        df = table_data if isinstance(table_data, pd.DataFrame) else pd.DataFrame(table_data)
+        if df.empty:
             return "Данные отсутствуют"
         
-        # Получаем заголовки из первого элемента
-        headers = list(table_data[0].keys())
-        
         # Формируем заголовки
-        header_line = " | ".join(str(header) for header in headers)
-        separator = "-" * len(header_line)
+        header_line = " | ".join(str(header) for header in df.columns)
+        
+        # Значения переводим в строки сразу по столбцам, берем максимум 15 строк
+        values = df.head(15).astype(object)
+        values = values.mask(values.isna(), 'пусто').astype(str)
+        # Ограничиваем длину значения: для читаемости и чтобы уложиться в бюджет
+        lengths = values.apply(lambda column: column.str.len())
+        max_length = self._cell_length_limit(lengths.to_numpy(), len(values.columns))
+        values = values.where(lengths <= max_length, values.apply(lambda column: column.str[:max_length - 3] + "..."))
         
         # Формируем строки данных
-        data_lines = []
-        for i, row in enumerate(table_data[:15], 1):  # Берем максимум 15 строк
-            row_values = []
-            for header in headers:
-                value = row.get(header, '')
-                # Ограничиваем длину значения для читаемости
-                if isinstance(value, str) and len(value) > 50:
-                    value = value[:47] + "..."
-                row_values.append(str(value))
-            
-            data_line = " | ".join(row_values)
-            data_lines.append(f"{i:2d}. {data_line}")
+        data_text = "\n".join([
+            f"{i:2d}. {' | '.join(row)}"
+            for i, row in enumerate(values.itertuples(index=False, name=None), 1)
+        ])
         
         # Объединяем все в одну строку
-        result = f"Заголовки: {header_line}\n"
-        result += f"Разделитель: {separator}\n"
-        result += "Данные:\n"
-        result += "\n".join(data_lines)
+        return f"Заголовки: {header_line}\nДанные:\n{data_text}"
+    
+    @staticmethod
+    def _cell_length_limit(lengths: np.ndarray, columns_count: int) -> int:
+        """
+        Подбирает наибольшую длину значения, при которой строки данных
+        укладываются в PROMPT_DATA_MAX_CHARS
+        
+        Укорачиваются только самые длинные значения, короткие остаются целиком.
+        
+        Args:
+            lengths: Длины значений, строки x столбцы
+            columns_count: Число столбцов
+            
+        Returns:
+            Предельная длина значения
+        """
+        # Номер строки и разделители между значениями занимают место в каждой строке
+        overhead = len(lengths) * (5 + 3 * (columns_count - 1))
+        limits = np.arange(PROMPT_CELL_MIN_LENGTH, PROMPT_CELL_MAX_LENGTH + 1)
+        totals = np.minimum(lengths.reshape(1, -1), limits.reshape(-1, 1)).sum(axis=1) + overhead
+        fitting = limits[totals <= PROMPT_DATA_MAX_CHARS]
+        return int(fitting[-1]) if len(fitting) else PROMPT_CELL_MIN_LENGTH
+    
+    def prewarm(self) -> bool:
+        """
+        Заранее устанавливает соединение с API
+        
+        Авторизация, поиск адресов сервисов и TLS соединение выполняются при
+        первом вызове SDK. Токенизация короткого сообщения проходит все эти
+        шаги, но не запускает генерацию текста, поэтому первый настоящий
+        анализ не тратит на них время.
         
-        return result
+        Returns:
+            True если соединение установлено, False иначе
+        """
+        try:
+            self.model.tokenize(PREWARM_MESSAGES, timeout=PREWARM_TIMEOUT)
+            logger.info("Соединение с Яндекс.GPT установлено заранее")
+            return True
+        except Exception as e:
+            logger.warning(f"Не удалось заранее установить соединение с Яндекс.GPT: {e}")
+            return False
     
     def test_connection(self) -> bool:
         """
@@ -185,8 +629,8 @@ class YandexGPTAnalyzer:
                 }
             ]
             
-            operation = self.model.configure(temperature=0.1).run_deferred(test_messages)
-            result = operation.wait()
+            operation = self.test_model.run_deferred(test_messages)
+            result = self._wait_operation(operation)
             
             if result and hasattr(result, 'alternatives') and result.alternatives:
                 logger.info("Тест подключения к Яндекс.GPT прошел успешно")
@@ -200,18 +644,32 @@ class YandexGPTAnalyzer:
             return False
 
 
-def create_yandex_analyzer() -> Optional[YandexGPTAnalyzer]:
+def create_yandex_analyzer(prewarm: bool = False) -> Optional[YandexGPTAnalyzer]:
     """
-    Создает экземпляр анализатора Яндекс.GPT
+    Возвращает общий экземпляр анализатора Яндекс.GPT
+    
+    Анализатор создаётся при первом вызове и переиспользуется, чтобы не
+    инициализировать SDK заново на каждый запрос. Если создать анализатор
+    не удалось, следующий вызов попробует снова.
+    
+    Args:
+        prewarm: Установить соединение с API в фоновом потоке сразу
+            после создания анализатора
     
     Returns:
         Экземпляр YandexGPTAnalyzer или None в случае ошибки
     """
-    try:
-        return YandexGPTAnalyzer()
-    except Exception as e:
-        logger.error(f"Не удалось создать анализатор Яндекс.GPT: {e}")
-        return None
+    global _analyzer
+    with _analyzer_lock:
+        if _analyzer is None:
+            try:
+                _analyzer = YandexGPTAnalyzer()
+            except Exception as e:
+                logger.error(f"Не удалось создать анализатор Яндекс.GPT: {e}")
+                return None
+            if prewarm:
+                threading.Thread(target=_analyzer.prewarm, daemon=True).start()
+        return _analyzer
 
 
 # Пример использования